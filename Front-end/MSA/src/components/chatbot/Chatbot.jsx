@@ -2,6 +2,10 @@ import { useState, useRef, useEffect } from 'react';
 import { sendMessage as apiSendMessage } from '../../utils/chatApi';
 import './Chatbot.css';
 
+// Typing effect: reveal buffered text every TYPING_INTERVAL_MS, catching up faster when a large chunk arrives
+const TYPING_INTERVAL_MS = 20;
+const TYPING_CATCH_UP_TICKS = 25;
+
 const Chatbot = () => {
   const [isOpen, setIsOpen] = useState(false);
   const [messages, setMessages] = useState([
@@ -16,6 +20,8 @@ const Chatbot = () => {
   const [isTyping, setIsTyping] = useState(false);
   const messagesEndRef = useRef(null);
   const textareaRef = useRef(null);
+  const pendingTextRef = useRef('');
+  const typingTimerRef = useRef(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -37,6 +43,48 @@ const Chatbot = () => {
     scrollToBottom();
   }, [messages]);
 
+  useEffect(() => () => clearInterval(typingTimerRef.current), []);
+
+  const updateLastBotMessage = (update) => {
+    setMessages(prev => {
+      const lastMessage = prev[prev.length - 1];
+      if (lastMessage && lastMessage.sender === 'bot') {
+        const updatedMessages = [...prev];
+        updatedMessages[prev.length - 1] = { ...lastMessage, text: update(lastMessage.text) };
+        return updatedMessages;
+      }
+      return prev; // Should not happen if placeholder is set correctly
+    });
+  };
+
+  const stopTyping = () => {
+    clearInterval(typingTimerRef.current);
+    typingTimerRef.current = null;
+    pendingTextRef.current = '';
+  };
+
+  const finishTyping = () => {
+    const rest = pendingTextRef.current;
+    stopTyping();
+    if (rest) updateLastBotMessage(text => text + rest);
+  };
+
+  const typeChunk = (chunk) => {
+    pendingTextRef.current += chunk;
+    if (typingTimerRef.current) return;
+    typingTimerRef.current = setInterval(() => {
+      const pending = pendingTextRef.current;
+      if (!pending) {
+        clearInterval(typingTimerRef.current);
+        typingTimerRef.current = null;
+        return;
+      }
+      const step = Math.max(1, Math.ceil(pending.length / TYPING_CATCH_UP_TICKS));
+      pendingTextRef.current = pending.slice(step);
+      updateLastBotMessage(text => text + pending.slice(0, step));
+    }, TYPING_INTERVAL_MS);
+  };
+
   const handleSendMessage = async (messageText = inputValue) => {
     if (!messageText.trim()) return;
 
@@ -47,6 +95,9 @@ const Chatbot = () => {
       timestamp: new Date()
     };
 
+    // Show the rest of a previous answer that is still being typed out
+    finishTyping();
+
     // Add user message and a placeholder for the bot's response
     setMessages(prev => [
       ...prev, 
@@ -62,34 +113,11 @@ const Chatbot = () => {
     setIsTyping(true);
 
     try {
-      await apiSendMessage(messageText, messages, (chunk) => {
-        setMessages(prev => {
-          const lastMessage = prev[prev.length - 1];
-          if (lastMessage && lastMessage.sender === 'bot') {
-            // Append the new chunk to the last bot message
-            const updatedMessages = [...prev];
-            updatedMessages[prev.length - 1] = {
-              ...lastMessage,
-              text: lastMessage.text + chunk
-            };
-            return updatedMessages;
-          }
-          return prev; // Should not happen if placeholder is set correctly
-        });
-      });
+      // The server sends chunks as soon as the model produces them; typeChunk animates them
+      await apiSendMessage(messageText, messages, typeChunk);
     } catch (error) {
-      setMessages(prev => {
-        const lastMessage = prev[prev.length - 1];
-        if (lastMessage && lastMessage.sender === 'bot') {
-          const updatedMessages = [...prev];
-          updatedMessages[prev.length - 1] = {
-            ...lastMessage,
-            text: "Sorry, I'm having trouble connecting to the server. Please try again later."
-          };
-          return updatedMessages;
-        }
-        return prev;
-      });
+      stopTyping();
+      updateLastBotMessage(() => "Sorry, I'm having trouble connecting to the server. Please try again later.");
     } finally {
       setIsTyping(false);
     }
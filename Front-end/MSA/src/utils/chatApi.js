@@ -2,6 +2,9 @@ import axios from 'axios';
 
 const API_URL = 'http://127.0.0.1:5001/api';
 
+// Issued by the backend on the first chat message; keeps this tab's history separate
+let chatSessionId = null;
+
 export const getIncidents = async () => {
   try {
     const response = await axios.get(`${API_URL}/incidents`);
@@ -39,7 +42,7 @@ export const sendMessage = async (message, history, onChunk) => {
       headers: {
         'Content-Type': 'application/json',
       },
-      body: JSON.stringify({ message, history }),
+      body: JSON.stringify({ message, history, session_id: chatSessionId }),
     });
 
     if (!response.body) {
@@ -49,6 +52,7 @@ export const sendMessage = async (message, history, onChunk) => {
     const reader = response.body.getReader();
     const decoder = new TextDecoder();
     let fullResponse = '';
+    let buffered = '';
 
     while (true) {
       const { done, value } = await reader.read();
@@ -56,27 +60,34 @@ export const sendMessage = async (message, history, onChunk) => {
         break;
       }
       
-      const chunk = decoder.decode(value, { stream: true });
-      // SSE format is "data: {...}\n\n"
-      const jsonStrings = chunk.match(/data: (.*)\n\n/g);
+      // SSE format is "data: {...}\n\n"; a network read can end mid-event,
+      // so keep the incomplete tail for the next read
+      buffered += decoder.decode(value, { stream: true });
+      const events = buffered.split('\n\n');
+      buffered = events.pop();
 
-      if (jsonStrings) {
-        for (const jsonString of jsonStrings) {
-          try {
-            const cleanJson = jsonString.replace(/^data: /, '').replace(/\n\n$/, '');
-            const parsed = JSON.parse(cleanJson);
-            
-            if (parsed.end_of_stream) {
-              return fullResponse;
-            }
-            
-            if (parsed.text) {
-              fullResponse += parsed.text;
-              onChunk(parsed.text); // Callback to update UI with the new chunk
-            }
-          } catch (e) {
-            console.error("Error parsing stream chunk:", e, "Chunk:", jsonString);
+      for (const event of events) {
+        if (!event.startsWith('data: ')) {
+          continue;
+        }
+        try {
+          const parsed = JSON.parse(event.slice('data: '.length));
+          
+          if (parsed.session_id) {
+            chatSessionId = parsed.session_id;
+            continue;
+          }
+
+          if (parsed.end_of_stream) {
+            return fullResponse;
+          }
+          
+          if (parsed.text) {
+            fullResponse += parsed.text;
+            onChunk(parsed.text); // Callback to update UI with the new chunk
           }
+        } catch (e) {
+          console.error("Error parsing stream chunk:", e, "Chunk:", event);
         }
       }
     }
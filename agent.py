@@ -1,6 +1,11 @@
+import argparse
 import asyncio
+import multiprocessing
+import signal
+import time
 from dotenv import load_dotenv
-from utility.agent_framework import MessageBus, Agent
+from utility.agent_framework import MessageBus, Agent, Supervisor, RESTART_ALWAYS
+from utility.ipc_bus import BusBroker, RemoteMessageBus
 from agents.news_scanner_agent import NewsScannerAgent
 from agents.dgms_monitor_agent import DGMSMonitorAgent
 from agents.incident_analysis_agent import IncidentAnalysisAgent
@@ -8,35 +13,150 @@ from agents.incident_analysis_agent import IncidentAnalysisAgent
 from agents.conversational_agent import ConversationalAgent
 from utility.local_search import google_web_search
 from utility.chatbot_utils import load_api_key, initialize_components, create_manual_chains
+from utility.config import (
+    DATA_DIR,
+    BUS_QUEUE_SIZE,
+    BUS_MAX_CONCURRENCY,
+    BUS_POLICY,
+    BUS_BACKGROUND_CONCURRENCY,
+    METRICS_PATH,
+    METRICS_EXPORT_INTERVAL,
+    DURABLE_BUS,
+    MESSAGE_LOG_PATH,
+    IPC_HOST,
+    IPC_PORT,
+    IPC_PEER_QUEUE_SIZE,
+    BROKER_LOG_PATH,
+    SHUTDOWN_DEADLINE,
+)
+from utility.metrics import export_periodically
+from utility.message_log import MessageLog
 
 
 load_dotenv()
 
-async def main():
-    message_bus = MessageBus()
+AGENT_ROLES = ("news_scanner", "dgms_monitor", "incident_analysis", "conversational_agent")
+
+
+def bus_options(log_path):
+    return {
+        "maxsize": BUS_QUEUE_SIZE,
+        "max_concurrency": BUS_MAX_CONCURRENCY,
+        "policy": BUS_POLICY,
+        "background_concurrency": BUS_BACKGROUND_CONCURRENCY,
+        "log": MessageLog(log_path) if DURABLE_BUS else None,
+    }
+
+
+def build_agent(role, message_bus):
+    """Construct the agent for a role. Only the incident analysis agent needs the chatbot components."""
+    if role == "news_scanner":
+        return NewsScannerAgent(role, message_bus)
+    if role == "dgms_monitor":
+        return DGMSMonitorAgent(role, message_bus)
+    if role == "conversational_agent":
+        return ConversationalAgent(role, message_bus)
+    if role == "incident_analysis":
+        api_key = load_api_key()
+        llm, vector_store, mongo_collection = initialize_components(api_key, "./chroma_db")
+        contextualize_q_chain, qa_chain = create_manual_chains(llm)
+        return IncidentAnalysisAgent(role, message_bus, google_web_search, llm, vector_store, mongo_collection, contextualize_q_chain, qa_chain)
+    raise ValueError(f"Unknown agent role: {role}")
 
-    # Initialize chatbot components
-    api_key = load_api_key()
-    llm, vector_store, mongo_collection = initialize_components(api_key, "./chroma_db")
-    contextualize_q_chain, qa_chain = create_manual_chains(llm)
 
-    agents = [
-        NewsScannerAgent("news_scanner", message_bus),
-        DGMSMonitorAgent("dgms_monitor", message_bus),
-        IncidentAnalysisAgent("incident_analysis", message_bus, google_web_search, llm, vector_store, mongo_collection, contextualize_q_chain, qa_chain),
+async def run_supervised(message_bus, agents, metrics_path):
+    """Run the bus, metrics exporter and agents under one Supervisor until SIGINT/SIGTERM, then drain."""
+    supervisor = Supervisor(message_bus)
+    supervisor.spawn("message_bus", message_bus.run, restart=RESTART_ALWAYS)
+    supervisor.spawn(
+        "metrics_exporter",
+        lambda: export_periodically(message_bus, metrics_path, METRICS_EXPORT_INTERVAL, supervisor),
+        restart=RESTART_ALWAYS,
+    )
+    for agent in agents:
+        await agent.start(supervisor)
 
-        ConversationalAgent("conversational_agent", message_bus),
-    ]
+    stop_requested = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_requested.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: fall back to KeyboardInterrupt
 
-    message_bus_task = asyncio.create_task(message_bus.run())
+    try:
+        await stop_requested.wait()
+    finally:
+        print(f"Shutting down, draining in-flight work (deadline {SHUTDOWN_DEADLINE:.0f}s)...")
+        await supervisor.shutdown(agents, deadline=SHUTDOWN_DEADLINE)
 
- 
-    agent_tasks = [asyncio.create_task(agent.start()) for agent in agents]
+
+async def main():
+    message_bus = MessageBus(**bus_options(MESSAGE_LOG_PATH))
+
+    agents = [build_agent(role, message_bus) for role in AGENT_ROLES]
 
     print("Mine Safety Multi-Agent System is running.")
 
+    await run_supervised(message_bus, agents, METRICS_PATH)
+
+
+# --- Multi-process mode: one OS process per agent, connected through a local broker ---
+
+async def run_agent_process(role):
+    message_bus = RemoteMessageBus(IPC_HOST, IPC_PORT, role, **bus_options(DATA_DIR / f"message_log_{role}.db"))
+    agent = build_agent(role, message_bus)
+    await run_supervised(message_bus, [agent], DATA_DIR / f"bus_metrics_{role}.json")
+
+
+def agent_process_entry(role):
+    load_dotenv()
+    asyncio.run(run_agent_process(role))
+
+
+def broker_process_entry():
+    # Processes restart independently, so the broker keeps what they miss while down
+    log = MessageLog(BROKER_LOG_PATH, max_attempts=10) if DURABLE_BUS else None
+    asyncio.run(BusBroker(IPC_HOST, IPC_PORT, log, IPC_PEER_QUEUE_SIZE).serve_forever())
+
+
+def run_multiprocess(roles=AGENT_ROLES, restart_delay=5):
+    """Run the broker and each agent in its own child process, restarting any that die."""
+    broker_process = multiprocessing.Process(target=broker_process_entry, name="bus_broker")
+    broker_process.start()
+
+    processes = {}
+    for role in roles:
+        processes[role] = multiprocessing.Process(target=agent_process_entry, args=(role,), name=role)
+        processes[role].start()
+    print(f"Mine Safety Multi-Agent System is running in {len(roles)} processes.")
+
+    try:
+        while True:
+            time.sleep(restart_delay)
+            if not broker_process.is_alive():
+                print(f"Bus broker exited with code {broker_process.exitcode}, restarting.")
+                broker_process = multiprocessing.Process(target=broker_process_entry, name="bus_broker")
+                broker_process.start()
+            for role, proc in list(processes.items()):
+                if not proc.is_alive():
+                    print(f"Agent process '{role}' exited with code {proc.exitcode}, restarting.")
+                    processes[role] = multiprocessing.Process(target=agent_process_entry, args=(role,), name=role)
+                    processes[role].start()
+    except KeyboardInterrupt:
+        print("Shutting down agent processes...")
+    finally:
+        for proc in [broker_process, *processes.values()]:
+            proc.terminate()
+        for proc in [broker_process, *processes.values()]:
+            proc.join(timeout=10)
 
-    await asyncio.gather(message_bus_task, *agent_tasks)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Mine Safety Multi-Agent System")
+    parser.add_argument("--multiprocess", action="store_true", help="run each agent in its own OS process")
+    args = parser.parse_args()
+    if args.multiprocess:
+        run_multiprocess()
+    else:
+        asyncio.run(main())
@@ -1,35 +1,31 @@
-import asyncio
 from utility.agent_framework import Agent
-from utility.config import DATA_DIR
-
-USER_QUERY_FILE = DATA_DIR / "user_query.txt"
-BOT_RESPONSE_FILE = DATA_DIR / "bot_response.txt"
+from utility.chat_channel import ChatChannelServer
+from utility.config import CHAT_CHANNEL_HOST, CHAT_CHANNEL_PORT, CHAT_TIMEOUT
 
 class ConversationalAgent(Agent):
     def __init__(self, name, message_bus):
         super().__init__(name, message_bus)
-        self.subscribe("final_answer", self.handle_final_answer)
+        self.channel = ChatChannelServer(CHAT_CHANNEL_HOST, CHAT_CHANNEL_PORT, self.handle_client_query, CHAT_TIMEOUT)
+        # A single handler keeps each stream's chunks in the order they were published
+        self.subscribe("chat_stream", self.handle_chat_stream, max_concurrency=1)
 
     async def run(self):
-        print(f"[{self.name}] Starting up and watching {USER_QUERY_FILE}")
-        # Ensure the files exist and are empty on startup
-        open(USER_QUERY_FILE, "w").close()
-        open(BOT_RESPONSE_FILE, "w").close()
+        print(f"[{self.name}] Serving chat channel on {CHAT_CHANNEL_HOST}:{CHAT_CHANNEL_PORT}")
+        await self.channel.serve_forever()
 
-        while self.running:
-            try:
-                with open(USER_QUERY_FILE, "r+") as f:
-                    query = f.read().strip()
-                    if query:
-                        print(f"[{self.name}] Received query: {query}")
-                        await self.publish("user_query", {"query": query})
-                        f.truncate(0)
-            except FileNotFoundError:
-                pass
-            await asyncio.sleep(1)
+    async def handle_client_query(self, stream_id, request):
+        query = (request.get("query") or "").strip()
+        if not query:
+            self.channel.push(stream_id, {"error": "No message provided", "end": True})
+            return
+        print(f"[{self.name}] Received query: {query}")
+        await self.publish("user_query", {
+            "query": query,
+            "history": request.get("history", []),
+            "session_id": request.get("session_id"),
+            "stream_id": stream_id,
+        })
 
-    async def handle_final_answer(self, message):
-        answer = message["payload"]["answer"]
-        print(f"[{self.name}] Received final answer: {answer}")
-        with open(BOT_RESPONSE_FILE, "w") as f:
-            f.write(answer)
+    async def handle_chat_stream(self, message):
+        payload = message["payload"]
+        self.channel.push(payload["stream_id"], payload)
@@ -12,22 +12,31 @@ from utility.tools.generate_safety_alerts import GenerateSafetyAlertsTool
 from utility.tools.generate_audit_report import GenerateAuditReportTool
 from utility.tools.search_cause_code_db import SearchCauseCodeDBTool
 from utility.tools.find_place_of_accident_code import FindPlaceOfAccidentCodeTool
-from utility.config import DATA_DIR
+from utility.config import (
+    DATA_DIR, NEWS_SCAN_TIMEOUT, CHAT_MAX_SESSIONS, CHAT_HISTORY_TURNS, CHAT_HISTORY_TOKEN_BUDGET, CHAT_QUERY_CONCURRENCY,
+    ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_CACHE_SIZE, CHAT_REWRITE_MODE,
+    RETRIEVAL_BUDGET, RETRIEVAL_TIMEOUTS, CONTEXT_BUDGETS, CONTEXT_RERANKER, INCIDENT_INDEX_SYNC_INTERVAL,
+    RETRIEVAL_THREADS, RETRIEVAL_MAX_ABANDONED,
+)
+from utility.chat_sessions import SessionStore
+from utility.answer_cache import SemanticAnswerCache, history_scope
+from utility.context_budget import Chunk, Reranker, assemble_context
+from utility.incident_index import incident_index
 import json
 import inspect
 import traceback
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 from langgraph.graph import StateGraph, END
 from typing import TypedDict, Annotated, List
 import operator
 from datetime import datetime, timezone
 
-from utility.chatbot_utils import get_standalone_question, retrieve_from_chroma, retrieve_from_mongodb, format_docs
-from langchain_core.messages import HumanMessage, AIMessage
-
-BOT_RESPONSE_FILE = DATA_DIR / "bot_response.txt"
-EOS_TOKEN = "<EOS>"
+from utility.chatbot_utils import (
+    get_standalone_question, retrieve_from_chroma, retrieve_from_mongodb, create_summary_chain,
+    retrieval_cache, is_standalone_query, similar_questions,
+)
 
 # Define the state for LangGraph
 class IncidentAnalysisState(TypedDict):
@@ -47,7 +56,6 @@ class IncidentAnalysisState(TypedDict):
 class IncidentAnalysisAgent(Agent):
     def __init__(self, name, message_bus, google_web_search_func, llm, vector_store, mongo_collection, contextualize_q_chain, qa_chain):
         super().__init__(name, message_bus)
-        self.chat_history_lock = asyncio.Lock()
         self.google_web_search = google_web_search_func
         self.extract_tool = ExtractIncidentFromNewsTool()
         self.check_db_tool = CheckIncidentInDBTool()
@@ -61,10 +69,11 @@ class IncidentAnalysisAgent(Agent):
         self.find_place_of_accident_code_tool = FindPlaceOfAccidentCodeTool()
         self.news_article_graph = self._build_news_article_graph()
         self.dgms_report_graph = self._build_dgms_report_graph()
-        self.subscribe("new_news_article", self.handle_news_article)
-        self.subscribe("new_dgms_report", self.handle_dgms_report)
-        self.subscribe("user_query", self.handle_user_query)
-        self.subscribe("news_scan_results", self.handle_news_scan_results)
+        # Each LangGraph run is heavy (LLM + scraping), so keep ingest handlers on a short leash
+        self.subscribe("new_news_article", self.handle_news_article, max_concurrency=2)
+        self.subscribe("new_dgms_report", self.handle_dgms_report, max_concurrency=4)
+        self.subscribe("user_query", self.handle_user_query, max_concurrency=CHAT_QUERY_CONCURRENCY)
+        self.subscribe("incident_added", self.handle_incident_added)
 
         # Chatbot components
         self.llm = llm
@@ -72,10 +81,12 @@ class IncidentAnalysisAgent(Agent):
         self.mongo_collection = mongo_collection
         self.contextualize_q_chain = contextualize_q_chain
         self.qa_chain = qa_chain
-        self.chat_history = [] # Maintain chat history for contextualization
-
-        # For agent collaboration
-        self.news_scan_complete = asyncio.Event()
+        self.summarize_chain = create_summary_chain(llm)
+        self.sessions = SessionStore(CHAT_MAX_SESSIONS, CHAT_HISTORY_TURNS) # Per-session chat history for contextualization
+        self.reranker = Reranker(CONTEXT_RERANKER)
+        self.answer_cache = SemanticAnswerCache(ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_CACHE_SIZE)
+        self.retrieval_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_THREADS, thread_name_prefix="retrieval")
+        self._abandoned_retrievals = set()  # futures that missed their deadline but are still running
 
     def _build_news_article_graph(self):
         workflow = StateGraph(IncidentAnalysisState)
@@ -99,12 +110,10 @@ class IncidentAnalysisAgent(Agent):
         workflow = StateGraph(IncidentAnalysisState)
         workflow.add_node("collect_dgms", self.collect_dgms_node)
         workflow.add_node("request_news_scan", self.request_news_scan_node)
-        workflow.add_node("wait_for_news_scan", self.wait_for_news_scan_node)
         workflow.add_node("update_dgms_db", self.update_dgms_db_node)
         workflow.set_entry_point("collect_dgms")
         workflow.add_edge("collect_dgms", "request_news_scan")
-        workflow.add_edge("request_news_scan", "wait_for_news_scan")
-        workflow.add_edge("wait_for_news_scan", "update_dgms_db")
+        workflow.add_edge("request_news_scan", "update_dgms_db")
         workflow.add_edge("update_dgms_db", END)
         return workflow.compile()
 
@@ -126,39 +135,41 @@ class IncidentAnalysisAgent(Agent):
             article["url"],
             article["title"],
         )
+        if db_add_result.get("status") == "success":
+            await self.publish("incident_added", {"_id": db_add_result.get("_id"), "source_url": article["url"]})
         return {"db_add_result": db_add_result}
 
     async def collect_dgms_node(self, state: IncidentAnalysisState) -> dict:
         print(f"[{self.name}] Collecting full DGMS report...")
         result = await asyncio.to_thread(self.collect_dgms_tool.use, state["dgms_report_link"]["link"])
         if result["status"] == "success":
+            await self.publish("incident_added", {"report_id": result["document"].get("report_id")})
             return {"dgms_document": result["document"]}
         else:
             print(f"Error collecting DGMS report: {result["message"]}")
             return {"dgms_document": None} # Or handle error state
 
     async def request_news_scan_node(self, state: IncidentAnalysisState) -> dict:
+        if not state["dgms_document"]:
+            return {"news_scan_results": None}
         print(f"[{self.name}] Requesting news scan from NewsScannerAgent...")
-        if state["dgms_document"]:
-            incident_details = {
-                "mine_name": state["dgms_document"].get("mine_details", {}).get("name"),
-                "district": state["dgms_document"].get("mine_details", {}).get("district"),
-                "state": state["dgms_document"].get("mine_details", {}).get("state"),
-                "date": state["dgms_document"].get("accident_date"),
-            }
-            await self.publish("scan_news_for_incident", incident_details)
-        return {}
-
-    async def wait_for_news_scan_node(self, state: IncidentAnalysisState) -> dict:
-        print(f"[{self.name}] Waiting for news scan results...")
-        await self.news_scan_complete.wait()
-        self.news_scan_complete.clear()
-        return {"news_scan_results": self.last_news_scan_results}
-
-    async def handle_news_scan_results(self, message):
+        incident_details = {
+            "mine_name": state["dgms_document"].get("mine_details", {}).get("name"),
+            "district": state["dgms_document"].get("mine_details", {}).get("district"),
+            "state": state["dgms_document"].get("mine_details", {}).get("state"),
+            "date": state["dgms_document"].get("accident_date"),
+        }
+        # Correlated request/reply, so concurrent DGMS graph runs each get their own results
+        try:
+            news_scan_results = await self.request(
+                "scan_news_for_incident", incident_details,
+                reply_type="news_scan_results", timeout=NEWS_SCAN_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            print(f"[{self.name}] News scan timed out after {NEWS_SCAN_TIMEOUT}s.")
+            return {"news_scan_results": None}
         print(f"[{self.name}] Received news scan results.")
-        self.last_news_scan_results = message["payload"]
-        self.news_scan_complete.set()
+        return {"news_scan_results": news_scan_results}
 
     async def update_dgms_db_node(self, state: IncidentAnalysisState) -> dict:
         print(f"[{self.name}] Updating DGMS report in DB with verification status...")
@@ -185,6 +196,7 @@ class IncidentAnalysisAgent(Agent):
         try:
             await asyncio.to_thread(coll.update_one, {"report_id": report_id}, {"$set": update_data})
             print(f"DGMS report {report_id} updated with verification status: {status}")
+            await self.publish("incident_added", {"report_id": report_id})
         except Exception as e:
             print(f"Error updating DGMS report {report_id} in DB: {e}")
         return {}
@@ -233,230 +245,212 @@ class IncidentAnalysisAgent(Agent):
 
 
 
-    #helper function
-    def stream_response_to_file(self, qa_chain, chat_history, query, context, file_path):
+    async def handle_incident_added(self, message):
+        # Cached answers and Mongo retrievals may no longer reflect what is in MongoDB
+        if len(self.answer_cache):
+            print(f"[{self.name}] New incident data; clearing {len(self.answer_cache)} cached answers.")
+        self.answer_cache.invalidate()
+        retrieval_cache.invalidate("mongodb")
+        incident_index.mark_stale()
+
+    async def embed_question(self, question):
+        """Embedding of the standalone question for the answer cache, or None if embedding fails."""
+        try:
+            return await asyncio.to_thread(self.vector_store.embeddings.embed_query, question)
+        except Exception as e:
+            print(f"[{self.name}] Could not embed question for the answer cache: {e}")
+            return None
+
+    async def contextualize(self, query, chat_history):
         """
-        Runs the streaming chain and writes chunks to a file.
-        This function is designed to be run in asyncio.to_thread.
+        Returns (standalone_question, context_task, rewritten). In "auto" mode, queries that
+        stand alone skip the rewrite; otherwise retrieval on the raw query starts alongside the
+        rewrite, and its task is returned when the rewrite barely changed the question.
+        context_task is None when retrieval still has to run on the standalone question;
+        rewritten says whether the history was folded into the question by the LLM.
         """
-        full_answer = ""
+        if CHAT_REWRITE_MODE == "always":
+            return await get_standalone_question(self.contextualize_q_chain, chat_history, query), None, True
+        if is_standalone_query(query, chat_history):
+            self.message_bus.metrics.incr("user_query", "rewrite_skipped")
+            return query, None, False
+
+        speculative = asyncio.create_task(self.build_context(query))
         try:
-            # Overwrite the file at the start of the response
-            with open(file_path, "w", encoding="utf-8") as f:
-                # .stream() is a synchronous generator
-                for chunk in qa_chain.stream({
-                    "input": query,
-                    "chat_history": chat_history,
-                    "context": context
-                }):
-                    f.write(chunk)
-                    f.flush()  # Force write to disk so the client can read it
-                    full_answer += chunk
-            
-            # After stream is done, append the End-of-Stream token
-            with open(file_path, "a", encoding="utf-8") as f:
-                f.write(EOS_TOKEN)
-                f.flush()
-            
+            standalone_question = await get_standalone_question(self.contextualize_q_chain, chat_history, query)
+        except BaseException:
+            speculative.cancel()
+            raise
+        if similar_questions(query, standalone_question):
+            self.message_bus.metrics.incr("user_query", "rewrite_overlap_kept")
+            return standalone_question, speculative, True
+        self.message_bus.metrics.incr("user_query", "rewrite_overlap_discarded")
+        speculative.cancel()
+        return standalone_question, None, True
+
+    async def retrieve_with_deadline(self, source, func, *args):
+        """
+        Runs one retrieval on the retrieval pool with its own deadline (capped by RETRIEVAL_BUDGET).
+        Returns None if the source timed out, failed or was skipped; the miss is recorded in the bus metrics.
+        A call that misses its deadline is left to finish, so a late result still lands in the retrieval
+        cache, but at most RETRIEVAL_MAX_ABANDONED of those may hold pool threads at once.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = min(RETRIEVAL_TIMEOUTS.get(source, RETRIEVAL_BUDGET), RETRIEVAL_BUDGET)
+        if len(self._abandoned_retrievals) >= RETRIEVAL_MAX_ABANDONED:
+            print(f"[{self.name}] {len(self._abandoned_retrievals)} timed-out retrievals still running; skipping {source}.")
+            self.message_bus.metrics.incr("retrieval", f"{source}_saturated")
+            return None
+        started = loop.time()
+        future = self.retrieval_pool.submit(func, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            # cancel() only succeeds for calls still queued; a running one keeps its thread until it returns
+            if not future.cancel():
+                self._abandoned_retrievals.add(future)
+                future.add_done_callback(self._abandoned_retrievals.discard)
+            print(f"[{self.name}] Retrieval from {source} missed its {timeout}s deadline; answering without it.")
+            self.message_bus.metrics.incr("retrieval", f"{source}_timeout")
+            return None
         except Exception as e:
-            print(f"[Agent] ERROR in stream_response_to_file: {e}")
-            # Try to write an error message to the file
-            try:
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(f"I encountered an error while streaming. Please try again.<EOS>")
-                    f.flush()
-            except Exception:
-                pass # Failed to write error
-        
+            print(f"[{self.name}] Retrieval from {source} failed: {e}")
+            self.message_bus.metrics.incr("retrieval", f"{source}_error")
+            return None
+        finally:
+            self.message_bus.metrics.latency[f"retrieval:{source}"].observe(loop.time() - started)
+
+    async def build_context(self, standalone_question):
+        """
+        Retrieves from all four sources in parallel and formats the combined QA context.
+        Sources that miss their deadline are left out, so the answer goes ahead with partial context.
+        The rest are deduped, reranked and trimmed to CONTEXT_BUDGETS before formatting.
+        """
+        (scored_chroma_docs, mongo_contexts, cause_code_context, place_of_accident_code_context) = await asyncio.gather(
+            self.retrieve_with_deadline("chroma", retrieve_from_chroma, self.vector_store, standalone_question),
+            self.retrieve_with_deadline("mongodb", retrieve_from_mongodb, self.mongo_collection, standalone_question),
+            self.retrieve_with_deadline(
+                "cause_code", retrieval_cache.fetch, "cause_code", standalone_question, 3,
+                lambda: self.search_cause_code_db_tool.use(standalone_question),
+            ),
+            self.retrieve_with_deadline(
+                "place_code", retrieval_cache.fetch, "place_code", standalone_question, 1,
+                lambda: self.find_place_of_accident_code_tool.use(standalone_question),
+            ),
+        )
+        missing = "(not retrieved in time)"
+
+        print(f"[{self.name}] Retrieved {len(scored_chroma_docs or [])} chroma docs and {len(mongo_contexts or [])} mongo contexts.")
+
+        chunks = [Chunk("chroma", doc.page_content, score) for doc, score in scored_chroma_docs or []]
+        chunks += [Chunk("mongodb", text.strip()) for text in mongo_contexts or []]
+        if cause_code_context:
+            chunks.append(Chunk("cause_code", cause_code_context))
+        if place_of_accident_code_context:
+            chunks.append(Chunk("place_code", place_of_accident_code_context))
+        selected = await asyncio.to_thread(assemble_context, standalone_question, chunks, CONTEXT_BUDGETS, self.reranker)
+
+        def section(source, result):
+            if result is None:
+                return missing
+            return "\n\n".join(selected.get(source, []))
+
+        return (
+            f"--- PDF Context (Historical) ---\n{section('chroma', scored_chroma_docs)}\n\n"
+            f"--- Real-time Data (Live) ---\n{section('mongodb', mongo_contexts)}\n\n"
+            f"--- Cause Code Data ---\n{section('cause_code', cause_code_context)}\n\n"
+            f"--- Place of Accident Code Data ---\n{section('place_code', place_of_accident_code_context)}"
+        )
+
+    async def stream_answer(self, stream_id, query, chat_history, context):
+        """
+        Streams the QA chain's chunks onto the bus as they are produced, so the
+        ConversationalAgent can forward them to the waiting client. Returns the full answer.
+        """
+        full_answer = ""
+        async for chunk in self.qa_chain.astream({
+            "input": query,
+            "chat_history": chat_history,
+            "context": context
+        }):
+            full_answer += chunk
+            await self.publish("chat_stream", {"stream_id": stream_id, "text": chunk})
+        await self.publish("chat_stream", {"stream_id": stream_id, "end": True})
         return full_answer
-    
 
     async def handle_user_query(self, message):
         query = message["payload"]["query"]
-        print(f"[{self.name}] handle_user_query: {query!r}")
-
+        stream_id = message["payload"]["stream_id"]
+        session = self.sessions.get(message["payload"].get("session_id") or stream_id)
+        print(f"[{self.name}] handle_user_query ({session.session_id}): {query!r}")
+
+        # Turns within one session run in order; different sessions run concurrently.
+        # If the session is already answering, queue the turn for that handler and free this slot.
+        session.pending.append((stream_id, query))
+        if session.busy:
+            print(f"[{self.name}] Session {session.session_id} is busy; queued turn ({len(session.pending)} waiting).")
+            return
+        session.busy = True
         try:
+            while session.pending:
+                stream_id, query = session.pending.popleft()
+                await self._answer_query(session, stream_id, query)
+        finally:
+            session.busy = False
 
-            # 1) get standalone question (likely sync): use helper
-            # print(f"[{self.name}] Getting standalone question...")
-            # standalone_question = await self._call_maybe_awaitable(
-            #     get_standalone_question,
-            #     self.contextualize_q_chain,
-            #     self.chat_history,
-            #     query,
-            #     timeout=30,
-            # )
-            # print(f"[{self.name}] Standalone question: {standalone_question!r}")
-
-            # --- RAG Process (Same as before) ---
+    async def _answer_query(self, session, stream_id, query):
+        try:
+            chat_history = session.history(CHAT_HISTORY_TOKEN_BUDGET)
+            generation = self.answer_cache.generation
             print(f"[{self.name}] DEBUG: Getting standalone question...")
-            standalone_question = await get_standalone_question(self.contextualize_q_chain, self.chat_history, query)
+            standalone_question, context_task, rewritten = await self.contextualize(query, chat_history)
             print(f"[{self.name}] DEBUG: Standalone question: {standalone_question}")
+            # Answers are shared across sessions only for questions that carry their own meaning;
+            # a question taken as-is with history behind it is cached for that conversation alone
+            cache_scope = None if rewritten or not chat_history else history_scope(session.session_id, chat_history)
 
+            # Retrieval starts alongside the embedding, so a cache miss does not pay for both in turn
+            if context_task is None:
+                context_task = asyncio.create_task(self.build_context(standalone_question))
+            try:
+                question_vector = await self.embed_question(standalone_question)
+            except BaseException:
+                context_task.cancel()
+                raise
+            cached = self.answer_cache.lookup(question_vector, cache_scope) if question_vector is not None else None
+            if cached is not None:
+                cached_question, full_answer, similarity = cached
+                context_task.cancel()
+                print(f"[{self.name}] Answer cache hit ({similarity:.3f}) for {cached_question!r}.")
+                self.message_bus.metrics.incr("user_query", "answer_cache_hit")
+                await self.publish("chat_stream", {"stream_id": stream_id, "text": full_answer})
+                await self.publish("chat_stream", {"stream_id": stream_id, "end": True})
+            else:
+                self.message_bus.metrics.incr("user_query", "answer_cache_miss")
+                combined_context = await context_task
+
+                print(f"[{self.name}] DEBUG: Streaming QA chain to the chat channel...")
+                full_answer = await self.stream_answer(stream_id, query, chat_history, combined_context)
+                print(f"[{self.name}] DEBUG: QA stream finished.")
+                if question_vector is not None and full_answer.strip():
+                    self.answer_cache.store(standalone_question, question_vector, full_answer, generation, cache_scope)
 
-            # 2) retrieve from vector store and mongo in parallel (non-blocking)
-            loop = asyncio.get_running_loop()
-            retrieve_chroma = loop.run_in_executor(None, retrieve_from_chroma, self.vector_store, standalone_question)
-            retrieve_mongo = loop.run_in_executor(None, retrieve_from_mongodb, self.mongo_collection, standalone_question)
-            search_cause_code = loop.run_in_executor(None, self.search_cause_code_db_tool.use, standalone_question)
-            search_place_of_accident_code = loop.run_in_executor(None, self.find_place_of_accident_code_tool.use, standalone_question)
-            scored_chroma_docs, mongo_contexts, cause_code_context, place_of_accident_code_context = await asyncio.gather(retrieve_chroma, retrieve_mongo, search_cause_code, search_place_of_accident_code)
-
-            print(f"[{self.name}] Retrieved {len(scored_chroma_docs)} chroma docs and {len(mongo_contexts)} mongo contexts.")
-
-            top_chroma_score = 0.0
-            chroma_docs = []
-            if scored_chroma_docs:
-                # scored_chroma_docs is list of (doc, score) pairs per your code earlier
-                top_chroma_score = scored_chroma_docs[0][1]
-                chroma_docs = [doc for doc, score in scored_chroma_docs]
-            chroma_context_str = format_docs(chroma_docs)
-            mongo_context_str = "\n\n".join(mongo_contexts)
-
-            combined_context = (
-                f"--- PDF Context (Historical) ---\n{chroma_context_str}\n\n"
-                f"--- Real-time Data (Live) ---\n{mongo_context_str}\n\n"
-                f"--- Cause Code Data ---\n{cause_code_context}\n\n"
-                f"--- Place of Accident Code Data ---\n{place_of_accident_code_context}"
-            )
-            
-            # --- !! KEY CHANGE !! ---
-            # Instead of self.qa_chain.invoke, we run our new streaming 
-            # file writer in a thread to keep the agent non-blocking.
-            
-            print(f"[{self.name}] DEBUG: Streaming QA chain to file...")
-            full_answer = await asyncio.to_thread(
-                self.stream_response_to_file,
-                self.qa_chain,  # This MUST be your *streaming* chain
-                self.chat_history,
-                query,
-                combined_context,
-                BOT_RESPONSE_FILE # Pass the file path
-            )
-            print(f"[{self.name}] DEBUG: QA stream finished.")
-
-# <<<<<<< HEAD
-#             # 3) call QA chain safely (it may be async or sync)
-#             print(f"[{self.name}] Invoking QA chain (with timeout)...")
-#             # you can tune timeout (e.g., 60s)
-#             qa_timeout = int(os.environ.get("QA_TIMEOUT_SEC", "60"))
-#             answer = await self._call_maybe_awaitable(
-#                 self.qa_chain.invoke,
-#                 {
-#                     "input": query,
-#                     "chat_history": self.chat_history,
-#                     "context": combined_context
-#                 },
-#                 timeout=qa_timeout
-#             )
-
-#             # 4) update chat history with lock
-#             async with self.chat_history_lock:
-#                 # keep a bounded history if needed
-#                 MAX_HISTORY = 50
-#                 self.chat_history.append(HumanMessage(content=query))
-#                 self.chat_history.append(AIMessage(content=answer))
-#                 if len(self.chat_history) > MAX_HISTORY:
-#                     # drop oldest pair
-#                     self.chat_history = self.chat_history[-MAX_HISTORY:]
-
-#             # 5) publish final answer (ensure publish is awaitable)
-#             print(f"[{self.name}] Publishing final answer...")
-#             publish_coro = self.publish("final_answer", {"answer": answer})
-#             if inspect.isawaitable(publish_coro):
-#                 await publish_coro
-#             else:
-#                 # publish may be sync, run in thread
-#                 await asyncio.to_thread(lambda: publish_coro)
-# =======
             # Update chat history (using the full answer)
-            self.chat_history.append(HumanMessage(content=query))
-            self.chat_history.append(AIMessage(content=full_answer))
-
-            # We no longer need to publish a "final_answer" message,
-            # because the client is reading the file directly.
-# >>>>>>> origin/mahima_branch
-
-            print(f"[{self.name}] Final answer published.")
+            session.add_turn(query, full_answer)
+            # The answer has already been streamed, so summarizing here only delays this session's next turn
+            await session.compact(self.summarize_chain)
 
         except asyncio.TimeoutError:
             tb = traceback.format_exc()
             print(f"[{self.name}] QA timed out. {tb}")
-            await self.publish("final_answer", {"answer": "The system timed out while generating an answer. Try again later."})
+            await self.publish("chat_stream", {
+                "stream_id": stream_id,
+                "error": "The system timed out while generating an answer. Try again later.",
+                "end": True,
+            })
         except Exception as e:
-# <<<<<<< HEAD
-#             tb = traceback.format_exc()
-#             print(f"[{self.name}] ERROR in handle_user_query: {e}\n{tb}")
-#             try:
-#                 await self.publish("final_answer", {"answer": "I encountered an internal error. Please try again."})
-#             except Exception:
-#                 # swallow publish failure to avoid crashing
-#                 print(f"[{self.name}] Failed to publish error message.")
-# =======
             print(f"[{self.name}] ERROR in handle_user_query: {e}")
-            # Try to write the error to the file for the client to see
-            try:
-                with open(BOT_RESPONSE_FILE, "w", encoding="utf-8") as f:
-                    f.write(f"I encountered an error: {e}<EOS>")
-                    f.flush()
-            except Exception:
-                pass
-
-    # async def handle_user_query(self, message):
-    #     query = message["payload"]["query"]
-    #     print(f"[{self.name}] DEBUG: Handling user query: {query}")
-
-    #     try:
-    #         # Perform RAG process
-    #         print(f"[{self.name}] DEBUG: Getting standalone question...")
-    #         standalone_question = await asyncio.to_thread(get_standalone_question, self.contextualize_q_chain, self.chat_history, query)
-    #         print(f"[{self.name}] DEBUG: Standalone question: {standalone_question}")
-
-    #         print(f"[{self.name}] DEBUG: Retrieving from ChromaDB...")
-    #         scored_chroma_docs = await asyncio.to_thread(retrieve_from_chroma, self.vector_store, standalone_question)
-    #         print(f"[{self.name}] DEBUG: Retrieved {len(scored_chroma_docs)} docs from ChromaDB.")
-
-    #         print(f"[{self.name}] DEBUG: Retrieving from MongoDB...")
-    #         mongo_contexts = await asyncio.to_thread(retrieve_from_mongodb, self.mongo_collection, standalone_question)
-    #         print(f"[{self.name}] DEBUG: Retrieved {len(mongo_contexts)} contexts from MongoDB.")
-
-    #         top_chroma_score = 0.0
-    #         if scored_chroma_docs:
-    #             top_chroma_score = scored_chroma_docs[0][1]
-    #             chroma_docs = [doc for doc, score in scored_chroma_docs]
-    #         else:
-    #             chroma_docs = []
-
-    #         chroma_context_str = format_docs(chroma_docs)
-    #         mongo_context_str = "\n\n".join(mongo_contexts)
-
-    #         combined_context = (
-    #             f"--- PDF Context (Historical) ---\n{chroma_context_str}\n\n"
-    #             f"--- Real-time Data (Live) ---\n{mongo_context_str}"
-    #         )
-
-    #         print(f"[{self.name}] DEBUG: Invoking QA chain...")
-    #         answer = await asyncio.to_thread(self.qa_chain.invoke, {
-    #             "input": query,
-    #             "chat_history": self.chat_history,
-    #             "context": combined_context
-    #         })
-    #         print(f"[{self.name}] DEBUG: QA chain finished.")
-
-    #         # Update chat history
-    #         self.chat_history.append(HumanMessage(content=query))
-    #         self.chat_history.append(AIMessage(content=answer))
-
-    #         # Publish the final answer
-    #         print(f"[{self.name}] DEBUG: Publishing final answer...")
-    #         await self.publish("final_answer", {"answer": answer})
-    #         print(f"[{self.name}] DEBUG: Final answer published.")
-
-    #     except Exception as e:
-    #         print(f"[{self.name}] ERROR in handle_user_query: {e}")
-    #         await self.publish("final_answer", {"answer": "I encountered an error while processing your request. Please try again."})
-
-# >>>>>>> origin/mahima_branch
+            await self.publish("chat_stream", {"stream_id": stream_id, "error": f"I encountered an error: {e}", "end": True})
 
     async def _run_periodic_analysis(self):
         while self.running:
@@ -498,8 +492,16 @@ class IncidentAnalysisAgent(Agent):
                 print(f"[{self.name}] ERROR in _run_periodic_report_generation: {e}")
             await asyncio.sleep(86400) # Generate report every 24 hours
 
+    async def _run_incident_embedding_backfill(self):
+        # Embeds incidents that were stored without an embedding, off the chat path
+        while self.running:
+            if self.mongo_collection is not None:
+                await asyncio.to_thread(incident_index.embed_missing, self.mongo_collection)
+            await asyncio.sleep(INCIDENT_INDEX_SYNC_INTERVAL)
+
     async def run(self):
-        asyncio.create_task(self._run_periodic_analysis())
-        asyncio.create_task(self._run_periodic_report_generation())
+        self.spawn_background("periodic_analysis", self._run_periodic_analysis)
+        self.spawn_background("periodic_report_generation", self._run_periodic_report_generation)
+        self.spawn_background("incident_embedding_backfill", self._run_incident_embedding_backfill)
         while self.running:
             await asyncio.sleep(1) # Keep agent alive
\ No newline at end of file
@@ -34,5 +34,5 @@ class NewsScannerAgent(Agent):
         query = f'{mine_name} mine accident in {district}, {state} on {date}'
         print(f"[{self.name}] Received scan request with query: {query}")
         articles = await asyncio.to_thread(self.monitor_news_tool.use, query, desired_count=1)
-        await self.publish("news_scan_results", {"articles": articles})
+        await self.reply(message, {"articles": articles})
         
\ No newline at end of file
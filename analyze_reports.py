@@ -2,7 +2,7 @@
 import os
 from pymongo import MongoClient
 import certifi
-from utility.config import MONGODB_URI, MONGODB_DB, MONGODB_COLLECTION, DATA_DIR
+from utility.config import MONGODB_URI, MONGODB_DB, MONGODB_COLLECTION, DATA_DIR, INCIDENT_EMBEDDING_FIELD
 from utility.analysis import make_advanced_report, render_narrative
 
 
@@ -17,7 +17,7 @@ def analyze_all_reports():
 
     client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=4000, tlsCAFile=certifi.where())
     coll = client[MONGODB_DB][MONGODB_COLLECTION]
-    docs = list(coll.find({}))
+    docs = list(coll.find({}, {INCIDENT_EMBEDDING_FIELD: 0}))
 
     report = make_advanced_report(
         docs,
@@ -4,13 +4,13 @@ from utility.db import ensure_mongo_collection
 from bson import json_util
 import json
 import os
-import time
-from utility.config import DATA_DIR
-
-USER_QUERY_FILE = DATA_DIR / "user_query.txt"
-BOT_RESPONSE_FILE = DATA_DIR / "bot_response.txt"
-EOS_TOKEN = "<EOS>"
-WAIT_TIMEOUT = 120  # seconds
+import uuid
+from utility.config import (
+    DATA_DIR, CHAT_CHANNEL_HOST, CHAT_CHANNEL_PORT, CHAT_TIMEOUT, CHAT_FRAME_CHARS, CHAT_FRAME_INTERVAL,
+    INCIDENT_EMBEDDING_FIELD,
+)
+from utility.metrics import load_snapshots
+from utility.chat_channel import stream_chat, coalesce
 
 app = Flask(__name__)
 CORS(app)
@@ -24,7 +24,7 @@ def get_incidents():
     if incidents_collection is None:
         return jsonify({"error": "Database connection failed"}), 500
 
-    incidents = list(incidents_collection.find({}))
+    incidents = list(incidents_collection.find({}, {INCIDENT_EMBEDDING_FIELD: 0}))
     # Use json_util to handle MongoDB's ObjectId and other BSON types
     return json.loads(json_util.dumps(incidents))
 
@@ -53,75 +53,45 @@ def get_alerts():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+    """Endpoint to get the latest message bus metrics snapshots exported by agent.py, one per process."""
+    try:
+        snapshots = load_snapshots(DATA_DIR)
+        if not snapshots:
+            return jsonify({"error": "No metrics snapshot yet. Is agent.py running?"}), 404
+        return jsonify(snapshots)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/api/chat", methods=["POST"])
 def chat():
-    """Endpoint to handle chat messages by communicating with the agent via files."""
+    """Endpoint to handle chat messages by streaming the agent's answer over the chat channel."""
     data = request.get_json()
     user_message = data.get("message")
     history = data.get("history", []) # Get history, default to empty list
+    # Each browser tab keeps its own session; a new one is issued on the first message
+    session_id = data.get("session_id") or uuid.uuid4().hex
 
     if not user_message:
         return jsonify({"error": "No message provided"}), 400
 
-    try:
-       
-        if BOT_RESPONSE_FILE.exists():
-            with open(BOT_RESPONSE_FILE, "w") as f:
-                f.truncate(0)
-
-        agent_payload = {
-            "query": user_message,
-            "history": history
-        }
-        with open(USER_QUERY_FILE, "w", encoding="utf-8") as f:
-            json.dump(agent_payload, f)
-
-        def stream_response():
-            """Generator function to poll the file and stream character by character."""
-            read_position = 0
-            start_time = time.time()
-            eos_found = False
-
-            while not eos_found and time.time() - start_time < WAIT_TIMEOUT:
-                if not BOT_RESPONSE_FILE.exists():
-                    time.sleep(0.05)
-                    continue
-
-                try:
-                    with open(BOT_RESPONSE_FILE, "r", encoding="utf-8") as f:
-                        file_size = os.path.getsize(BOT_RESPONSE_FILE)
-                        if file_size > read_position:
-                            f.seek(read_position)
-                            new_text = f.read()
-                            
-                           
-                            read_position += len(new_text.encode('utf-8'))
-
-                            if EOS_TOKEN in new_text:
-                                eos_found = True
-                                final_chunk = new_text.split(EOS_TOKEN)[0]
-                               
-                                for char in final_chunk:
-                                    yield f"data: {json.dumps({'text': char})}\n\n"
-                                    time.sleep(0.02)  
-                            else:
-                               
-                                for char in new_text:
-                                    yield f"data: {json.dumps({'text': char})}\n\n"
-                                    time.sleep(0.02)  
-                except (IOError, json.JSONDecodeError):
-                    pass
-                
-                time.sleep(0.05) 
-
-            yield f"data: {json.dumps({'end_of_stream': True})}\n\n"
-
-        return Response(stream_response(), mimetype='text/event-stream')
-
-    except Exception as e:
-        print(f"Error during chat setup: {e}") 
-      
-        return Response(json.dumps({"error": f"An error occurred: {str(e)}"}), status=500, mimetype='application/json')
+    def stream_response():
+        """Generator function to relay the agent's chunks as they arrive; the client does the typing effect."""
+        yield f"data: {json.dumps({'session_id': session_id})}\n\n"
+        try:
+            chunks = stream_chat(user_message, CHAT_CHANNEL_HOST, CHAT_CHANNEL_PORT, session_id=session_id, history=history, timeout=CHAT_TIMEOUT)
+            if CHAT_FRAME_CHARS > 0:
+                chunks = coalesce(chunks, CHAT_FRAME_CHARS, CHAT_FRAME_INTERVAL)
+            for chunk in chunks:
+                yield f"data: {json.dumps({'text': chunk})}\n\n"
+        except Exception as e:
+            print(f"Error during chat stream: {e}")
+            yield f"data: {json.dumps({'text': f'I encountered an error: {e}'})}\n\n"
+
+        yield f"data: {json.dumps({'end_of_stream': True})}\n\n"
+
+    return Response(stream_response(), mimetype='text/event-stream', headers={"X-Session-Id": session_id, "Cache-Control": "no-cache"})
 
 
 if __name__ == "__main__":
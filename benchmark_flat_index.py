@@ -0,0 +1,86 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from utility.flat_index import FlatIndex, QUANTIZED_DTYPES, has_flat_index, quantize
+
+# Recall@k and resident memory of the quantised flat index formats against exact float32 search.
+# Queries are stored vectors with Gaussian noise added, so no embedding API calls are made.
+#   python benchmark_flat_index.py chroma_db            (needs export_flat_index.py first)
+#   python benchmark_flat_index.py --synthetic 200000   (random corpus, e.g. to size a VM)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_indexes(directory, rescores):
+    base = FlatIndex.load(directory)
+    indexes = [("float32", 0, base)]
+    for dtype in QUANTIZED_DTYPES:
+        for rescore in rescores:
+            indexes.append((dtype, rescore, FlatIndex.load(directory, dtype, rescore)))
+    return base, indexes
+
+
+def synthetic_indexes(rows, dimension, rescores, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, rows // 50), dimension)).astype(np.float32)
+    vectors = centers[rng.integers(len(centers), size=rows)] + 0.5 * rng.normal(size=(rows, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [str(i) for i in range(rows)]
+    empty = [""] * rows
+    base = FlatIndex(vectors, ids, empty, empty)
+    indexes = [("float32", 0, base)]
+    for dtype in QUANTIZED_DTYPES:
+        codes, scale = quantize(vectors, dtype)
+        for rescore in rescores:
+            indexes.append((dtype, rescore, FlatIndex(vectors, ids, empty, empty, codes, scale, rescore)))
+    return base, indexes
+
+
+def recall_at_k(truth, found, k):
+    hits = sum(len({i for i, _ in t[:k]} & {i for i, _ in f[:k]}) for t, f in zip(truth, found))
+    return hits / (k * len(truth))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall@k vs memory for the flat index formats.")
+    parser.add_argument("store", nargs="?", default="chroma_db", help="store directory with an exported flat index")
+    parser.add_argument("--synthetic", type=int, default=0, help="benchmark a random corpus of this many vectors instead")
+    parser.add_argument("--dimension", type=int, default=768, help="vector size for --synthetic")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.05, help="typical length of the noise added to sampled query vectors")
+    parser.add_argument("--rescore", type=int, nargs="*", default=[0, 2, 4], help="re-scoring factors to try")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        base, indexes = synthetic_indexes(args.synthetic, args.dimension, args.rescore, args.seed)
+        label = f"synthetic {args.synthetic} x {args.dimension}"
+    else:
+        directory = args.store if os.path.isabs(args.store) else os.path.join(SCRIPT_DIR, args.store)
+        if not has_flat_index(directory):
+            print(f"Error: no flat index in {directory}. Run export_flat_index.py first.")
+            return
+        base, indexes = load_indexes(directory, args.rescore)
+        label = directory
+
+    rng = np.random.default_rng(args.seed)
+    sample = rng.integers(len(base), size=args.queries)
+    queries = np.asarray(base.vectors[np.sort(sample)], dtype=np.float32)
+    queries += args.noise * rng.normal(size=queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+    truth = base.search_batch(queries, args.k)
+
+    print(f"Corpus: {label} ({len(base)} vectors), {args.queries} queries, k={args.k}\n")
+    print(f"{'format':<9} {'rescore':>7} {'memory MB':>10} {'recall@k':>9} {'ms/query':>9}")
+    for dtype, rescore, index in indexes:
+        start = time.perf_counter()
+        found = index.search_batch(queries, args.k)
+        elapsed = (time.perf_counter() - start) * 1000 / len(queries)
+        print(f"{dtype:<9} {rescore if index.codes is not None else '-':>7} {index.memory_bytes() / 2**20:>10.2f} "
+              f"{recall_at_k(truth, found, args.k):>9.3f} {elapsed:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
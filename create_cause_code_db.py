@@ -3,19 +3,20 @@ import os
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from dotenv import load_dotenv
+from utility.config import EMBEDDING_PROVIDER, EMBEDDING_MODEL
+from utility.flat_index import has_flat_index, export_flat_index
+from utility.vector_stores import get_embeddings, read_store_info, write_store_info
 
 # --- CONFIG ---
 load_dotenv()
 PDF_PATH = "cause_codes.pdf"
 CHROMA_DB_DIR = "cause_code_db"
-EMBEDDING_MODEL = "models/text-embedding-004"
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 # --- SCRIPT ---
 def main():
-    if not GOOGLE_API_KEY:
+    if EMBEDDING_PROVIDER == "google" and not GOOGLE_API_KEY:
         print("Error: GOOGLE_API_KEY not found in .env file.")
         return
 
@@ -35,15 +36,19 @@ def main():
     splits = text_splitter.split_documents(documents)
 
     print(f"Creating ChromaDB vector store with {len(splits)} chunks...")
-    embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=GOOGLE_API_KEY)
+    embeddings = get_embeddings()
     vector_store = Chroma.from_documents(
         documents=splits,
         embedding=embeddings,
         persist_directory=CHROMA_DB_DIR
     )
+    write_store_info(CHROMA_DB_DIR)
+    if has_flat_index(CHROMA_DB_DIR):  # keep an exported flat index in step with the new vectors
+        info = read_store_info(CHROMA_DB_DIR)  # the sidecar names what the vectors were built with
+        export_flat_index(vector_store, CHROMA_DB_DIR, info["provider"], info["model"])
 
     print(f"\n--- ChromaDB for Cause Codes Created ---")
-    print(f"Vector store created at: {CHROMA_DB_DIR}")
+    print(f"Vector store created at: {CHROMA_DB_DIR} ({EMBEDDING_PROVIDER}: {EMBEDDING_MODEL})")
     print(f"Number of documents: {vector_store._collection.count()}")
 
 if __name__ == "__main__":
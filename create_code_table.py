@@ -0,0 +1,15 @@
+from utility.code_table import CAUSE, build_code_table
+from utility.config import CAUSE_CODE_PDF, CODE_TABLE_PATH
+
+# Parses Statement 4.0 (pages 26-27 of cause_codes.pdf) into data/code_table.json,
+# the table FindCauseCodeTool and FindPlaceOfAccidentCodeTool look codes up in.
+def main():
+    print(f"Parsing code table from: {CAUSE_CODE_PDF}")
+    entries = build_code_table(CAUSE_CODE_PDF, CODE_TABLE_PATH)
+    causes = sum(1 for e in entries if e.kind == CAUSE)
+    print(f"\n--- Code Table Created ---")
+    print(f"Cause codes: {causes}, place of accident codes: {len(entries) - causes}")
+    print(f"Written to: {CODE_TABLE_PATH}")
+
+if __name__ == "__main__":
+    main()
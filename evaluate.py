@@ -19,7 +19,7 @@ from ragas.llms import LangchainLLMWrapper
 from ragas.embeddings import LangchainEmbeddingsWrapper
 from ragas.run_config import RunConfig
 
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from langchain_google_genai import ChatGoogleGenerativeAI
 
 # Try to import Chroma from langchain_chroma (new package) if available,
 # otherwise fall back to langchain_community.vectorstores.Chroma (deprecated).
@@ -34,12 +34,13 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 
 from prompts import CONTEXTUALIZE_Q_SYSTEM_PROMPT, QA_SYSTEM_PROMPT
+from utility.config import EMBEDDING_PROVIDER, EMBEDDING_MODEL
+from utility.vector_stores import make_embeddings, with_cache
 
 # -------------------- CONFIG --------------------
 # PERSIST_DIRECTORY = "./chroma_db"
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PERSIST_DIRECTORY = os.path.join(SCRIPT_DIR, "chroma_db")
-EMBEDDING_MODEL = "models/text-embedding-004"
 LLM_MODEL = "models/gemini-pro-latest"
 
 # Rate-limit/retry settings
@@ -105,11 +106,9 @@ def initialize_components(api_key, persist_directory):
         google_api_key=api_key,
         max_retries=MAX_RETRIES
     )
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        google_api_key=api_key,
-        max_retries=MAX_RETRIES
-    )
+    # Cached, so repeated ragas runs do not re-embed the same questions and answers
+    google_kwargs = {"max_retries": MAX_RETRIES} if EMBEDDING_PROVIDER == "google" else {}
+    embeddings = with_cache(make_embeddings(EMBEDDING_MODEL, EMBEDDING_PROVIDER, **google_kwargs), EMBEDDING_MODEL)
     vector_store = Chroma(
         persist_directory=persist_directory,
         embedding_function=embeddings
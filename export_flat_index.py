@@ -0,0 +1,55 @@
+import argparse
+import os
+
+from dotenv import load_dotenv
+from langchain_chroma import Chroma
+
+from utility.config import CAUSE_CODE_DB_DIR
+from utility.flat_index import VECTORS_FILE, export_flat_index
+from utility.vector_stores import read_store_info
+
+# Exports the vectors of chroma_db and cause_code_db to memory-mapped flat indexes
+# (flat_index.npy + flat_index.json inside each store's directory). Set VECTOR_BACKEND=flat
+# to serve the stores from them. Re-run after the stores are rebuilt.
+load_dotenv()
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORES = {
+    "chroma_db": os.path.join(SCRIPT_DIR, "chroma_db"),
+    "cause_code_db": os.path.join(SCRIPT_DIR, CAUSE_CODE_DB_DIR),
+}
+
+
+def export(persist_directory):
+    if not os.path.exists(persist_directory):
+        print(f"Skipping {persist_directory}: not found.")
+        return False
+    # The vectors are whatever the store was built with, which need not be what is configured now
+    info = read_store_info(persist_directory)
+    if info is None:
+        print(f"[WARN] {persist_directory} has no embedding record; the export will not be checked against the configured model.")
+        info = {}
+    try:
+        rows = export_flat_index(Chroma(persist_directory=persist_directory), persist_directory,
+                                 info.get("provider", ""), info.get("model", ""))
+    except Exception as e:
+        print(f"[ERROR] Could not export {persist_directory}: {e}")
+        return False
+    size = os.path.getsize(os.path.join(persist_directory, VECTORS_FILE))
+    print(f"Exported {rows} vectors from {persist_directory} ({size / 1024:.0f} KB)")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Chroma stores to flat memory-mapped indexes.")
+    parser.add_argument("stores", nargs="*", help=f"stores to export: {', '.join(sorted(STORES))} (default: all)")
+    args = parser.parse_args()
+    unknown = set(args.stores) - set(STORES)
+    if unknown:
+        parser.error(f"unknown store(s): {', '.join(sorted(unknown))}")
+
+    for name in args.stores or sorted(STORES):
+        export(STORES[name])
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,16 @@ import sys
 import glob
 from langchain_community.document_loaders import UnstructuredPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 # from langchain_community.vectorstores import Chroma
 from langchain_chroma import Chroma
 from dotenv import load_dotenv
+from utility.config import EMBEDDING_PROVIDER, EMBEDDING_MODEL
+from utility.flat_index import has_flat_index, export_flat_index
+from utility.vector_stores import get_embeddings, read_store_info, write_store_info
 
 load_dotenv()
 api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
+if EMBEDDING_PROVIDER == "google" and not api_key:
     print("Error: GOOGLE_API_KEY not found in .env file.")
     sys.exit(1)
 
@@ -60,11 +62,8 @@ else:
     print("No chunks were created. Check your document and splitter settings.")
 
 #Initialize Embeddings
-print("\nInitializing Gemini embedding model...")
-embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004",
-    google_api_key=api_key
-)
+print(f"\nInitializing embedding model ({EMBEDDING_PROVIDER}: {EMBEDDING_MODEL})...")
+embeddings = get_embeddings()  # cached, so re-ingesting unchanged chunks reuses their vectors
 
 #Create and Persist Vector Store
 print("Creating vector store with Chroma...")
@@ -75,6 +74,11 @@ vector_store = Chroma.from_documents(
 )
 
 
+write_store_info(PERSIST_DIRECTORY)
+if has_flat_index(PERSIST_DIRECTORY):  # keep an exported flat index in step with the new vectors
+    info = read_store_info(PERSIST_DIRECTORY)  # the sidecar names what the vectors were built with
+    export_flat_index(vector_store, PERSIST_DIRECTORY, info["provider"], info["model"])
+
 print(f"\nSuccessfully created vector store.")
 print(f"Total vectors stored: {vector_store._collection.count()}")
 
@@ -3,6 +3,8 @@ import sys
 import pymongo
 from dotenv import load_dotenv
 
+from utility.config import INCIDENT_EMBEDDING_FIELD
+
 MONGO_DB_NAME = "mines_safety"             # The name of your database
 MONGO_COLLECTION_NAME = "dgms_reports"  # The name of your collection
 # MONGO_FIELD_TO_SEARCH = "description"      # The field that contains the text you want to search
@@ -46,6 +48,13 @@ try:
     for field, _ in compound_text_index:
         print(f"  - {field}")
 
+    # Lets the chatbot's incident index fetch only embeddings added since its last sync
+    embedding_index = collection.create_index(
+        [(f"{INCIDENT_EMBEDDING_FIELD}.model", 1), (f"{INCIDENT_EMBEDDING_FIELD}.updated_at", 1)],
+        name="Incident_Embedding_Sync",
+    )
+    print(f"Successfully created index: '{embedding_index}'")
+
 except pymongo.errors.OperationFailure as e:
     print(f"\n--- ERROR ---")
     print(f"An error occurred: {e}")
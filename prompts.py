@@ -34,3 +34,13 @@ QA_SYSTEM_PROMPT = (
     "information is not available in the retrieved records. "
     "Be precise, analytical, and focused on safety."
 )
+
+HISTORY_SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a mine safety officer "
+    "and an AI assistant. Update the existing summary with the new exchanges below. "
+    "Keep every mine name, location, date, incident, cause code and figure that was "
+    "discussed, and any question that is still open. Drop pleasantries and repetition. "
+    "Reply with the updated summary only, in at most 150 words.\n\n"
+    "Existing summary:\n{summary}\n\n"
+    "New exchanges:\n{conversation}"
+)
@@ -0,0 +1,78 @@
+import argparse
+import os
+import shutil
+import time
+
+from dotenv import load_dotenv
+from langchain_chroma import Chroma
+
+from utility.config import EMBEDDING_PROVIDER, EMBEDDING_MODEL, CAUSE_CODE_DB_DIR
+from utility.flat_index import has_flat_index, export_flat_index
+from utility.vector_stores import get_embeddings, read_store_info, write_store_info
+
+# Re-embeds the chunks already stored in chroma_db and cause_code_db with the configured
+# EMBEDDING_PROVIDER/EMBEDDING_MODEL (e.g. EMBEDDING_PROVIDER=local), without re-reading the PDFs.
+# The old store is kept as <dir>.bak until the next rebuild.
+load_dotenv()
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORES = {
+    "chroma_db": os.path.join(SCRIPT_DIR, "chroma_db"),
+    "cause_code_db": os.path.join(SCRIPT_DIR, CAUSE_CODE_DB_DIR),
+}
+BATCH_SIZE = 256
+
+
+def rebuild(persist_directory, embeddings):
+    if not os.path.exists(persist_directory):
+        print(f"Skipping {persist_directory}: not found.")
+        return False
+
+    data = Chroma(persist_directory=persist_directory).get(include=["documents", "metadatas"])
+    ids, texts, metadatas = data["ids"], data["documents"], data["metadatas"]
+    if not ids:
+        print(f"Skipping {persist_directory}: no stored documents. Build it from the PDFs instead "
+              f"(extract.py / create_cause_code_db.py), which also use the configured provider.")
+        return False
+
+    staging = persist_directory + ".rebuild"
+    shutil.rmtree(staging, ignore_errors=True)
+    store = Chroma(persist_directory=staging, embedding_function=embeddings)
+    start = time.time()
+    for i in range(0, len(ids), BATCH_SIZE):
+        store.add_texts(
+            texts[i:i + BATCH_SIZE],
+            metadatas=[m or {} for m in metadatas[i:i + BATCH_SIZE]],
+            ids=ids[i:i + BATCH_SIZE],
+        )
+        print(f"  {min(i + BATCH_SIZE, len(ids))}/{len(ids)} chunks embedded")
+    write_store_info(staging)
+    if has_flat_index(persist_directory):  # keep an exported flat index in step with the new vectors
+        info = read_store_info(staging)  # the sidecar names what the vectors were built with
+        export_flat_index(store, staging, info["provider"], info["model"])
+    del store
+
+    backup = persist_directory + ".bak"
+    shutil.rmtree(backup, ignore_errors=True)
+    os.rename(persist_directory, backup)
+    os.rename(staging, persist_directory)
+    print(f"Rebuilt {persist_directory} ({len(ids)} chunks, {time.time() - start:.1f}s); previous store in {backup}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed the Chroma stores with the configured embedding provider.")
+    parser.add_argument("stores", nargs="*", help=f"stores to rebuild: {', '.join(sorted(STORES))} (default: all)")
+    args = parser.parse_args()
+    unknown = set(args.stores) - set(STORES)
+    if unknown:
+        parser.error(f"unknown store(s): {', '.join(sorted(unknown))}")
+
+    print(f"Embedding with {EMBEDDING_PROVIDER}: {EMBEDDING_MODEL}")
+    embeddings = get_embeddings()
+    for name in args.stores or sorted(STORES):
+        print(f"\n--- Rebuilding {name} ---")
+        rebuild(STORES[name], embeddings)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ import os
 import json
 from datetime import datetime, timezone
 from pymongo.errors import PyMongoError
-from utility.config import OUTPUT_PARSED_PATH, MONGODB_DB, MONGODB_COLLECTION
+from utility.config import OUTPUT_PARSED_PATH, MONGODB_DB, MONGODB_COLLECTION, INCIDENT_EMBEDDING_FIELD
 from utility.scraper import scrape_fatal_reports
 from utility.extract import extract_text_from_url
 from utility.parser import (
@@ -11,6 +11,7 @@ from utility.parser import (
     parse_report_to_schema_heuristic,
 )
 from utility.db import ensure_mongo_collection
+from utility.incident_index import incident_embedding
 from utility.chatbot_utils import initialize_components
 
 # local constants pulled from config module
@@ -26,6 +27,10 @@ def process_link(link, coll):
 
     # Insert/upsert into MongoDB
     if coll is not None:
+        # Stored with the incident for vector retrieval; not kept on the returned doc
+        embedding = incident_embedding(doc)
+        if embedding:
+            doc[INCIDENT_EMBEDDING_FIELD] = embedding
         try:
             if doc.get("report_id"):
                 coll.replace_one({"report_id": doc["report_id"]}, doc, upsert=True)
@@ -34,6 +39,7 @@ def process_link(link, coll):
             print("  Stored in MongoDB")
         except PyMongoError as e:
             print(f" MongoDB write failed: {e}")
+        doc.pop(INCIDENT_EMBEDDING_FIELD, None)
     return doc
 
 
@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("langchain_chroma")
+pytest.importorskip("langchain_google_genai")
+
+from langchain_core.documents import Document
+
+from utility.code_table import CAUSE, match_in_text
+from utility.tools.find_cause_code import FindCauseCodeTool
+
+# A cause_code_db chunk as create_cause_code_db.py stores it: a 1000-character slice of
+# the two-column Statement 4.0 page text extracted from cause_codes.pdf
+CHUNK = (
+    "78 \n \nSTATEMENT NO. 4.0 \n \nCodes for classification of accidents by cause and place of occurrence \n \n \n \n"
+    " Code    Cause of Accident                           Code     Cause of Accident                            \n \n"
+    "       Ground movement                                           Explosives                                \n"
+    " 0111  Fall of roof                                        0551  Solid blasting projectiles                \n"
+    " 0112  Fall of sides(other than overhangs)                 0552  Deep hole blasting projectiles            \n"
+    " 0113  Fall of overhang                                    0553  Secondary blasting projectiles            \n"
+    " 0114  Rock burst/bumps                                    0554  Other projectiles                         \n"
+    " 0115  Air blast                                           0555  Misfires/sockets(while drilling into)     \n"
+    " 0116  Premature collapse of workings/pillars              0556  Misfire/socket(other than drilling into)  \n"
+)
+
+
+class ChunkStore:
+    """Returns CHUNK as the nearest document for every query, like the real store does for these inputs."""
+
+    def similarity_search_batch(self, queries, k=4):
+        return [[(Document(page_content=CHUNK), 0.82)] for _ in queries]
+
+
+def tool_without_code_table(store):
+    tool = FindCauseCodeTool.__new__(FindCauseCodeTool)
+    tool.code_table = None
+    tool.vector_store = store
+    return tool
+
+
+def test_match_in_text_picks_the_listed_code_that_fits():
+    assert match_in_text(CHUNK, "roof fall in the depillaring district", CAUSE).code == "0111"
+    assert match_in_text(CHUNK, "deep hole blasting projectile hit a worker", CAUSE).code == "0552"
+    assert match_in_text(CHUNK, "What caused the Tapin North accident?", CAUSE) is None
+
+
+def test_search_batch_returns_codes_from_real_chunks():
+    tool = tool_without_code_table(ChunkStore())
+    results = tool._search_batch(["Fall of roof while drilling", "", "sides fell on the trammer"])
+    assert results[0] == ("0111", 0.82)
+    assert results[1] == ("", 0.0)
+    assert results[2][0] == "0112"
@@ -1,55 +1,545 @@
-
 import asyncio
-from collections import defaultdict
+import contextvars
+import itertools
+import time
+import traceback
+import uuid
+from collections import defaultdict, deque
+
+from utility.metrics import BusMetrics
+
+# Backpressure policies applied when a subscription queue is full
+BLOCK = "block"              # publisher waits until the subscriber has room
+DROP_OLDEST = "drop_oldest"  # evict the oldest queued message to make room
+REJECT = "reject"            # refuse the new message and raise BusFullError
+
+# Priority lanes, highest first. The scheduler always drains a higher lane before a lower one.
+INTERACTIVE = "interactive"  # user-facing chat traffic
+INGEST = "ingest"            # new reports/articles and the scans they trigger
+BACKGROUND = "background"    # periodic analysis output, alerts, audit reports
+PRIORITIES = (INTERACTIVE, INGEST, BACKGROUND)
+
+# Lane used when a publisher does not ask for one explicitly
+DEFAULT_PRIORITIES = {
+    "user_query": INTERACTIVE,
+    "chat_stream": INTERACTIVE,
+    "new_dgms_report": INGEST,
+    "new_news_article": INGEST,
+    "scan_news_for_incident": INGEST,
+    "news_scan_results": INGEST,
+    "incident_added": INGEST,
+}
+
+# Supervisor restart policies
+RESTART_ALWAYS = "always"          # restart whenever the task ends
+RESTART_ON_FAILURE = "on_failure"  # restart only if the task raised
+RESTART_NEVER = "never"
+
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_BACKGROUND_CONCURRENCY = 1
+
+# Set while a bus handler runs, so anything it publishes is known to be follow-on traffic
+_in_handler = contextvars.ContextVar("in_handler", default=False)
+
+
+class BusFullError(Exception):
+    """Raised by publish when a REJECT subscription has no room for a message."""
+
+
+def priority_for(message_type):
+    return DEFAULT_PRIORITIES.get(message_type, BACKGROUND)
+
+
+class Subscription:
+    """
+    One callback's view of the bus: a bounded set of pending messages split
+    into priority lanes, plus a cap on how many handler tasks may run at once.
+    """
+
+    def __init__(self, message_type, callback, changed, metrics, maxsize=DEFAULT_QUEUE_SIZE,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, policy=BLOCK, draining=lambda: False):
+        if policy not in (BLOCK, DROP_OLDEST, REJECT):
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.message_type = message_type
+        self.callback = callback
+        self.maxsize = maxsize
+        self.max_concurrency = max_concurrency
+        self.policy = policy
+        self.name = f"{message_type}:{getattr(callback, '__qualname__', repr(callback))}"
+        self._lanes = {lane: deque() for lane in PRIORITIES}
+        self._in_flight = set()
+        self._changed = changed
+        self._metrics = metrics
+        self._draining = draining
+        self.dropped = 0
+        self.rejected = 0
+
+    def depth(self):
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def in_flight(self):
+        return len(self._in_flight)
+
+    async def offer(self, message, seq):
+        """Queue a message, applying the backpressure policy if the queue is full."""
+        lane = message.get("priority", BACKGROUND)
+        async with self._changed:
+            if self.depth() >= self.maxsize:
+                if self.policy == REJECT:
+                    self.rejected += 1
+                    self._metrics.incr(self.message_type, "rejected")
+                    raise BusFullError(f"Subscription {self.name} is full ({self.maxsize} pending).")
+                if self.policy == DROP_OLDEST:
+                    # Shed the least important work first
+                    victim = next(self._lanes[l] for l in reversed(PRIORITIES) if self._lanes[l])
+                    victim.popleft()
+                    self.dropped += 1
+                    self._metrics.incr(self.message_type, "dropped")
+                elif not (message.get("follow_on") and self._draining()):
+                    # While draining, top-level work stays queued, so follow-on traffic must not wait for room
+                    await self._changed.wait_for(
+                        lambda: self.depth() < self.maxsize or (message.get("follow_on") and self._draining())
+                    )
+            self._lanes[lane].append((seq, message))
+            self._changed.notify_all()
+
+    def head(self, lane, follow_on_only=False):
+        """Sequence number of the oldest (follow-on, if asked) message in a lane, or None."""
+        for seq, message in self._lanes[lane]:
+            if not follow_on_only or message.get("follow_on"):
+                return seq
+        return None
+
+    def has_follow_on(self):
+        return any(message.get("follow_on") for lane in self._lanes.values() for _, message in lane)
+
+    def pop(self, lane, seq):
+        entries = self._lanes[lane]
+        if entries[0][0] == seq:
+            return entries.popleft()[1]
+        for i, (queued_seq, message) in enumerate(entries):
+            if queued_seq == seq:
+                del entries[i]
+                return message
+        raise KeyError(seq)
+
 
 class MessageBus:
-    def __init__(self):
+    def __init__(self, maxsize=DEFAULT_QUEUE_SIZE, max_concurrency=DEFAULT_MAX_CONCURRENCY, policy=BLOCK,
+                 background_concurrency=DEFAULT_BACKGROUND_CONCURRENCY, log=None):
         self.subscriptions = defaultdict(list)
-        self.queue = asyncio.Queue()
+        self.maxsize = maxsize
+        self.max_concurrency = max_concurrency
+        self.policy = policy
+        self.background_concurrency = background_concurrency
+        self._changed = asyncio.Condition()
+        self._seq = itertools.count()
+        self._background_in_flight = 0
+        self.metrics = BusMetrics()
+        self.log = log  # optional utility.message_log.MessageLog for durable message types
+        self._pending_replies = {}  # correlation_id -> (reply_type, Future)
+        self._replayed = False
+        # Anything logged after this was published (and delivered live) by this run; replay stops here
+        self._replay_ceiling = log.last_offset() if log is not None else 0
+        self._draining = False
 
     async def publish(self, message):
-        await self.queue.put(message)
+        message_type = message.get("type")
+        message.setdefault("priority", priority_for(message_type))
+        self._mark_follow_on(message)
+        self.metrics.record_publish(message)
+        await self._deliver(message)
+
+    @staticmethod
+    def _mark_follow_on(message):
+        """Tag messages published by a running handler (stream frames, requests, replies) so drain still delivers them."""
+        if _in_handler.get():
+            message["follow_on"] = True
+
+    async def request(self, message, reply_type, timeout):
+        """
+        Publish a request tagged with a fresh correlation_id and wait for the reply
+        of type `reply_type` carrying the same id. Raises asyncio.TimeoutError.
+        """
+        correlation_id = uuid.uuid4().hex
+        message["correlation_id"] = correlation_id
+        message["reply_type"] = reply_type
+        future = asyncio.get_running_loop().create_future()
+        self._pending_replies[correlation_id] = (reply_type, future)
+        try:
+            await self._expect_replies(reply_type)
+            await self.publish(message)
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending_replies.pop(correlation_id, None)
+
+    async def _expect_replies(self, reply_type):
+        """Hook for transports that must register interest in reply messages; local delivery needs nothing."""
+
+    def _resolve_reply(self, message):
+        pending = self._pending_replies.get(message.get("correlation_id"))
+        if pending is None:
+            return
+        reply_type, future = pending
+        if message.get("type") == reply_type and not future.done():
+            future.set_result(message)
+
+    async def _deliver(self, message):
+        """Persist (if durable) and queue a message for every local subscription of its type."""
+        message_type = message.get("type")
+        self._resolve_reply(message)
+        subscriptions = list(self.subscriptions.get(message_type, []))
+        if self.log is not None and self.log.is_durable(message_type) and subscriptions:
+            message["offset"] = await asyncio.to_thread(
+                self.log.append, message, [sub.name for sub in subscriptions]
+            )
+        seq = next(self._seq)
+        for subscription in subscriptions:
+            await subscription.offer(message, seq)
+
+    async def replay(self):
+        """
+        Re-queue durable messages left unacked by a previous run (at-least-once delivery).
+        Only offsets logged before this bus was created are replayed: agents may publish
+        before the scheduler gets here, and those messages are already queued live.
+        """
+        if self.log is None:
+            return
+        await asyncio.to_thread(self.log.compact)
+        for subs in list(self.subscriptions.values()):
+            for subscription in subs:
+                pending = await asyncio.to_thread(self.log.unacked, subscription.name, self._replay_ceiling)
+                for offset, message in pending:
+                    message["offset"] = offset
+                    print(f"[MessageBus] Redelivering {message.get('type')} (offset {offset}) to {subscription.name}")
+                    self.metrics.incr(message.get("type"), "redelivered")
+                    await subscription.offer(message, next(self._seq))
+
+    def subscribe(self, message_type, callback, maxsize=None, max_concurrency=None, policy=None):
+        subscription = Subscription(
+            message_type,
+            callback,
+            self._changed,
+            self.metrics,
+            maxsize=maxsize or self.maxsize,
+            max_concurrency=max_concurrency or self.max_concurrency,
+            policy=policy or self.policy,
+            draining=lambda: self._draining,
+        )
+        self.subscriptions[message_type].append(subscription)
+        return subscription
+
+    def _next_ready(self):
+        """
+        Pick the (subscription, lane, seq) of the most urgent message that may start now.
+        While draining only follow-on messages from in-flight handlers are started.
+        """
+        best = None
+        for subs in self.subscriptions.values():
+            for subscription in subs:
+                if subscription.in_flight() >= subscription.max_concurrency:
+                    continue
+                for rank, lane in enumerate(PRIORITIES):
+                    if lane == BACKGROUND and self._background_in_flight >= self.background_concurrency:
+                        continue
+                    seq = subscription.head(lane, follow_on_only=self._draining)
+                    if seq is not None:
+                        if best is None or (rank, seq) < best[0]:
+                            best = ((rank, seq), subscription, lane, seq)
+                        break
+        return best and best[1:]
+
+    def metrics_snapshot(self):
+        """Counters, handler latencies and live queue depths as a JSON-friendly dict."""
+        snap = self.metrics.snapshot(self)
+        snap["lanes"] = {
+            lane: sum(len(sub._lanes[lane]) for subs in self.subscriptions.values() for sub in subs)
+            for lane in PRIORITIES
+        }
+        snap["background_in_flight"] = self._background_in_flight
+        if self.log is not None:
+            snap["committed_offsets"] = self.log.committed_offsets()
+        return snap
+
+    def in_flight(self):
+        return sum(sub.in_flight() for subs in self.subscriptions.values() for sub in subs)
+
+    def _quiescent(self):
+        """Nothing running and no follow-on traffic left to deliver."""
+        return self.in_flight() == 0 and not any(
+            sub.has_follow_on() for subs in self.subscriptions.values() for sub in subs
+        )
 
-    def subscribe(self, message_type, callback):
-        self.subscriptions[message_type].append(callback)
+    async def drain(self, timeout):
+        """
+        Stop starting handlers for new top-level messages and wait up to `timeout` seconds
+        for in-flight ones to finish, still delivering what they publish along the way
+        (chat_stream frames, requests and their replies). Whatever is still running after
+        that is cancelled. Returns the number of handlers that had to be cancelled.
+        """
+        async with self._changed:
+            self._draining = True
+            self._changed.notify_all()
+            try:
+                await asyncio.wait_for(self._changed.wait_for(self._quiescent), timeout)
+                return 0
+            except asyncio.TimeoutError:
+                pass
+        leftovers = [task for subs in self.subscriptions.values() for sub in subs for task in sub._in_flight]
+        for task in leftovers:
+            task.cancel()
+        await asyncio.gather(*leftovers, return_exceptions=True)
+        return len(leftovers)
 
     async def run(self):
+        """Scheduler loop: dispatch pending messages in priority order within the concurrency caps."""
+        if not self._replayed:
+            self._replayed = True
+            await self.replay()
         while True:
-            message = await self.queue.get()
-            message_type = message.get("type")
-            if message_type in self.subscriptions:
-                for callback in self.subscriptions[message_type]:
-                    asyncio.create_task(callback(message))
-            self.queue.task_done()
+            async with self._changed:
+                ready = self._next_ready()
+                while ready is None:
+                    await self._changed.wait()
+                    ready = self._next_ready()
+                subscription, lane, seq = ready
+                message = subscription.pop(lane, seq)
+                if lane == BACKGROUND:
+                    self._background_in_flight += 1
+                subscription._in_flight.add(asyncio.create_task(self._handle(subscription, message, lane)))
+                self._changed.notify_all()
+
+    async def _handle(self, subscription, message, lane):
+        started = time.perf_counter()
+        error = None
+        completed = False
+        _in_handler.set(True)
+        try:
+            await subscription.callback(message)
+            completed = True
+        except asyncio.CancelledError:
+            self.metrics.incr(subscription.message_type, "cancelled")
+            raise
+        except Exception as e:
+            error = e
+            print(f"[MessageBus] Handler {subscription.name} failed: {e}")
+            traceback.print_exc()
+        finally:
+            if completed or error is not None:
+                self.metrics.record_handler(subscription.name, subscription.message_type, time.perf_counter() - started, error)
+            # Failed or cancelled handlers stay unacked so the message is redelivered on the next start
+            if completed and self.log is not None and "offset" in message:
+                try:
+                    await asyncio.to_thread(self.log.ack, message["offset"], subscription.name)
+                except Exception as e:
+                    print(f"[MessageBus] Failed to ack offset {message['offset']} for {subscription.name}: {e}")
+            async with self._changed:
+                subscription._in_flight.discard(asyncio.current_task())
+                if lane == BACKGROUND:
+                    self._background_in_flight -= 1
+                self._changed.notify_all()
+
+
+class _SupervisedTask:
+    def __init__(self, name, factory, restart):
+        self.name = name
+        self.factory = factory
+        self.restart = restart
+        self.task = None
+        self.state = "starting"
+        self.restarts = 0
+        self.last_error = None
+        self.started_at = None
+
+
+class Supervisor:
+    """
+    Owns agent loops and their background tasks. Each child is a zero-argument
+    coroutine function; when it crashes (or ends, under RESTART_ALWAYS) it is
+    started again after an exponential backoff. liveness() reports every child's
+    state, and shutdown() stops agents, drains the bus and cancels what is left.
+    """
+
+    def __init__(self, message_bus=None, base_backoff=1.0, max_backoff=300.0, stable_after=60.0):
+        self.message_bus = message_bus
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after  # a run this long resets the backoff
+        self._children = {}
+        self._watchers = set()
+        self._closing = False
+
+    def is_alive(self, name):
+        """True if a child of this name is running or waiting to be restarted."""
+        child = self._children.get(name)
+        return child is not None and child.state not in ("stopped", "failed")
+
+    def spawn(self, name, factory, restart=RESTART_ON_FAILURE):
+        if self.is_alive(name):
+            raise ValueError(f"Supervised task '{name}' is already running.")
+        child = _SupervisedTask(name, factory, restart)
+        self._children[name] = child
+        watcher = asyncio.create_task(self._watch(child))
+        self._watchers.add(watcher)
+        watcher.add_done_callback(self._watchers.discard)
+        return child
+
+    async def _watch(self, child):
+        backoff = self.base_backoff
+        while True:
+            child.state = "running"
+            child.started_at = time.monotonic()
+            child.task = asyncio.create_task(child.factory())
+            failed = False
+            try:
+                await child.task
+            except asyncio.CancelledError:
+                if self._closing or child.task.cancelled():
+                    child.state = "stopped"
+                    return
+                raise
+            except Exception as e:
+                failed = True
+                child.last_error = f"{type(e).__name__}: {e}"
+                print(f"[Supervisor] '{child.name}' crashed: {e}")
+                traceback.print_exc()
+
+            if self._closing or child.restart == RESTART_NEVER or (child.restart == RESTART_ON_FAILURE and not failed):
+                child.state = "failed" if failed else "stopped"
+                return
+
+            if time.monotonic() - child.started_at >= self.stable_after:
+                backoff = self.base_backoff
+            child.state = "backing_off"
+            child.restarts += 1
+            print(f"[Supervisor] Restarting '{child.name}' in {backoff:.1f}s (restart #{child.restarts}).")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def stop(self, name):
+        child = self._children.get(name)
+        if child is not None and child.task is not None:
+            child.restart = RESTART_NEVER
+            child.task.cancel()
+
+    def liveness(self):
+        now = time.monotonic()
+        return {
+            name: {
+                "state": child.state,
+                "restarts": child.restarts,
+                "last_error": child.last_error,
+                "uptime_s": round(now - child.started_at, 1) if child.state == "running" else 0.0,
+            }
+            for name, child in self._children.items()
+        }
+
+    def healthy(self):
+        return all(child.state in ("running", "stopped") for child in self._children.values())
+
+    async def shutdown(self, agents=(), deadline=30.0):
+        """Stop agents, give in-flight handlers until `deadline` seconds to finish, then cancel everything."""
+        self._closing = True
+        for agent in agents:
+            agent.running = False
+        if self.message_bus is not None:
+            cancelled = await self.message_bus.drain(deadline)
+            if cancelled:
+                print(f"[Supervisor] Cancelled {cancelled} handler(s) still running after {deadline}s.")
+        for child in self._children.values():
+            if child.task is not None:
+                child.task.cancel()
+        await asyncio.gather(*self._watchers, return_exceptions=True)
+        print("[Supervisor] Shutdown complete.")
+
 
 class Agent:
     def __init__(self, name, message_bus):
         self.name = name
         self.message_bus = message_bus
         self.running = False
+        self.supervisor = None
         self._task = None
+        self._background = {}  # name -> task, when there is no supervisor
+        self._supervised = set()  # supervisor child names started by spawn_background
 
-    async def start(self):
+    async def start(self, supervisor=None):
         self.running = True
+        self.supervisor = supervisor
         print(f"Agent {self.name} started.")
-        self._task = asyncio.create_task(self.run())
+        if supervisor is not None:
+            supervisor.spawn(self.name, self.run)
+        else:
+            self._task = asyncio.create_task(self.run())
 
     async def stop(self):
         self.running = False
+        if self.supervisor is not None:
+            self.supervisor.stop(self.name)
+            for child_name in self._supervised:
+                self.supervisor.stop(child_name)
         if self._task:
             self._task.cancel()
+        for task in list(self._background.values()):
+            task.cancel()
         print(f"Agent {self.name} stopped.")
 
+    def spawn_background(self, name, factory, restart=RESTART_ON_FAILURE):
+        """
+        Run a long-lived loop owned by this agent, under the supervisor when there is one.
+        Idempotent: when run() is restarted after a crash, a loop that is still alive is left alone.
+        """
+        if self.supervisor is not None:
+            child_name = f"{self.name}.{name}"
+            if not self.supervisor.is_alive(child_name):
+                self.supervisor.spawn(child_name, factory, restart=restart)
+            self._supervised.add(child_name)
+        else:
+            task = self._background.get(name)
+            if task is None or task.done():
+                task = asyncio.create_task(factory())
+                self._background[name] = task
+                task.add_done_callback(lambda done: self._forget_background(name, done))
+
+    def _forget_background(self, name, task):
+        if self._background.get(name) is task:
+            del self._background[name]
+
     async def run(self):
         raise NotImplementedError("Each agent must implement its own run method.")
 
-    async def publish(self, message_type, payload):
+    async def publish(self, message_type, payload, priority=None):
         message = {
             "from_agent": self.name,
             "type": message_type,
             "payload": payload,
+            "priority": priority or priority_for(message_type),
         }
         await self.message_bus.publish(message)
 
-    def subscribe(self, message_type, callback):
-        self.message_bus.subscribe(message_type, callback)
+    def subscribe(self, message_type, callback, **options):
+        return self.message_bus.subscribe(message_type, callback, **options)
+
+    async def request(self, message_type, payload, reply_type, timeout=60, priority=None):
+        """Publish a request and wait for its correlated reply; returns the reply payload."""
+        message = {
+            "from_agent": self.name,
+            "type": message_type,
+            "payload": payload,
+            "priority": priority or priority_for(message_type),
+        }
+        reply = await self.message_bus.request(message, reply_type, timeout)
+        return reply["payload"]
+
+    async def reply(self, request_message, payload, priority=None):
+        """Answer a message sent with Agent.request."""
+        reply_type = request_message["reply_type"]
+        message = {
+            "from_agent": self.name,
+            "type": reply_type,
+            "payload": payload,
+            "priority": priority or request_message.get("priority") or priority_for(reply_type),
+            "correlation_id": request_message["correlation_id"],
+        }
+        await self.message_bus.publish(message)
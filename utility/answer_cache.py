@@ -0,0 +1,99 @@
+import hashlib
+import time
+
+import numpy as np
+
+
+def history_scope(session_id, chat_history):
+    """
+    Cache scope for a question that was answered in light of `chat_history` rather than
+    rewritten into a standalone one: the same words can mean something else elsewhere.
+    """
+    digest = hashlib.sha1(str(session_id).encode("utf-8"))
+    for message in chat_history:
+        digest.update(b"\0" + f"{getattr(message, 'type', '')}:{getattr(message, 'content', message)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by the embedding of the standalone question. A lookup hits when a
+    stored question is at least `threshold` cosine-similar and younger than `ttl` seconds.
+    Entries only match lookups with the same `scope`: None for questions that stand on
+    their own, a `history_scope` digest for ones that depend on a conversation.
+    The cache is cleared whenever new incident data lands (see `invalidate`).
+    """
+
+    def __init__(self, threshold=0.95, ttl=3600, max_entries=500):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.questions = []
+        self.answers = []
+        self.created = []
+        self.scopes = []
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.generation = 0  # bumped on invalidate, so answers built from stale data are not stored
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        keep = [i for i, created in enumerate(self.created) if created >= cutoff]
+        if len(keep) == len(self.created):
+            return
+        self.questions = [self.questions[i] for i in keep]
+        self.answers = [self.answers[i] for i in keep]
+        self.created = [self.created[i] for i in keep]
+        self.scopes = [self.scopes[i] for i in keep]
+        self.vectors = self.vectors[keep]
+
+    def lookup(self, vector, scope=None):
+        """Returns (question, answer, similarity) for the closest fresh match in `scope`, or None."""
+        self._expire()
+        if scope not in self.scopes:
+            self.misses += 1
+            return None
+        similarities = self.vectors @ self._normalize(vector)
+        similarities[[s != scope for s in self.scopes]] = -np.inf
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.questions[best], self.answers[best], float(similarities[best])
+
+    def store(self, question, vector, answer, generation=None, scope=None):
+        if generation is not None and generation != self.generation:
+            return
+        vector = self._normalize(vector)
+        if not self.answers:
+            self.vectors = vector[np.newaxis, :]
+        else:
+            self.vectors = np.vstack([self.vectors, vector])
+        self.questions.append(question)
+        self.answers.append(answer)
+        self.created.append(time.time())
+        self.scopes.append(scope)
+        if len(self.answers) > self.max_entries:
+            # entries are in insertion order, so the oldest go first
+            excess = len(self.answers) - self.max_entries
+            self.questions = self.questions[excess:]
+            self.answers = self.answers[excess:]
+            self.created = self.created[excess:]
+            self.scopes = self.scopes[excess:]
+            self.vectors = self.vectors[excess:]
+
+    def invalidate(self):
+        self.generation += 1
+        self.questions, self.answers, self.created, self.scopes = [], [], [], []
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.answers)
@@ -0,0 +1,113 @@
+"""
+Streaming chat channel between the agent process and its clients (app.py, converse.py).
+
+The ConversationalAgent serves a localhost TCP endpoint. A client sends one
+JSON line with the question and then reads JSON lines back until the end frame:
+    client -> {"query": "...", "session_id": "...", "history": [...]}
+    server -> {"text": "<chunk>"} ... {"end": true}   (or {"error": "...", "end": true})
+Chunks are forwarded as soon as the QA chain yields them.
+"""
+import asyncio
+import json
+import socket
+import time
+import uuid
+
+from utility.agent_framework import BusFullError
+from utility.ipc_bus import MAX_FRAME_BYTES, encode_frame
+
+DEFAULT_TIMEOUT = 120  # seconds to wait for the next frame
+
+
+class ChatChannelServer:
+    """Accepts chat connections and routes each stream's frames back to its socket."""
+
+    def __init__(self, host, port, on_query, reply_timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.on_query = on_query  # async callable(stream_id, request_dict)
+        self.reply_timeout = reply_timeout  # seconds to wait for the agent's next frame
+        self.streams = {}
+
+    async def serve_forever(self):
+        server = await asyncio.start_server(self._on_connect, self.host, self.port, limit=MAX_FRAME_BYTES)
+        print(f"[ChatChannel] Listening on {self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+    def push(self, stream_id, frame):
+        """Hand a frame to the connection waiting on stream_id. Frames for unknown streams are dropped."""
+        queue = self.streams.get(stream_id)
+        if queue is not None:
+            queue.put_nowait(frame)
+
+    async def _on_connect(self, reader, writer):
+        stream_id = uuid.uuid4().hex
+        queue = asyncio.Queue()
+        self.streams[stream_id] = queue
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            request = json.loads(line)
+            try:
+                await self.on_query(stream_id, request)
+            except BusFullError as e:
+                print(f"[ChatChannel] Stream {stream_id} rejected: {e}")
+                writer.write(encode_frame({"error": "The agent is busy; please try again shortly.", "end": True}))
+                await writer.drain()
+                return
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), self.reply_timeout)
+                except asyncio.TimeoutError:
+                    print(f"[ChatChannel] Stream {stream_id} timed out after {self.reply_timeout}s")
+                    frame = {"error": "Timed out waiting for the agent's answer.", "end": True}
+                writer.write(encode_frame(frame))
+                await writer.drain()
+                if frame.get("end"):
+                    break
+        except (ConnectionError, json.JSONDecodeError) as e:
+            print(f"[ChatChannel] Stream {stream_id} closed early: {e}")
+        finally:
+            self.streams.pop(stream_id, None)
+            writer.close()
+
+
+def stream_chat(query, host, port, session_id=None, history=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Blocking client for the chat channel: yields answer chunks as they arrive.
+    Raises RuntimeError if the agent reports an error, TimeoutError if it goes quiet.
+    """
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall(encode_frame({"query": query, "session_id": session_id, "history": history or []}))
+        with sock.makefile("r", encoding="utf-8") as lines:
+            for line in lines:
+                frame = json.loads(line)
+                if frame.get("text"):
+                    yield frame["text"]
+                if frame.get("error"):
+                    raise RuntimeError(frame["error"])
+                if frame.get("end"):
+                    return
+    raise ConnectionError("Chat channel closed before the answer finished.")
+
+
+def coalesce(chunks, max_chars=64, max_interval=0.05):
+    """
+    Merge small chunks into larger frames. A frame is flushed once it holds
+    max_chars characters or max_interval seconds have passed since the last flush,
+    whichever comes first; whatever is left is flushed when the stream ends.
+    """
+    buffer = []
+    size = 0
+    last_flush = time.monotonic()
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        now = time.monotonic()
+        if size >= max_chars or now - last_flush >= max_interval:
+            yield "".join(buffer)
+            buffer, size, last_flush = [], 0, now
+    if buffer:
+        yield "".join(buffer)
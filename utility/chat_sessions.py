@@ -0,0 +1,110 @@
+import time
+from collections import OrderedDict, deque
+
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+
+from utility.context_budget import estimate_tokens
+
+MAX_UNSUMMARIZED_TURNS = 10  # turns kept for a retry if the summarizer keeps failing
+
+
+def _clip(text, max_tokens):
+    """Cut text to about max_tokens at a word boundary."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:max_tokens * 4].rsplit(" ", 1)[0] + " ..."
+
+
+class ChatSession:
+    """
+    History for one chat session. The last `recent_turns` turns are kept verbatim;
+    older turns are folded into a running summary by `compact`. Turns run one at a
+    time so history stays in order: queries that arrive while one is being answered
+    wait in `pending` and are picked up by the handler that is already busy.
+    """
+
+    def __init__(self, session_id, recent_turns):
+        self.session_id = session_id
+        self.recent_turns = recent_turns
+        self.turns = []  # (query, answer) pairs, oldest first
+        self.summary = ""
+        self._to_summarize = []
+        self.pending = deque()  # (stream_id, query) waiting for the current turn to finish
+        self.busy = False
+        self.last_used = time.time()
+
+    def add_turn(self, query, answer):
+        self.turns.append((query, answer))
+        if len(self.turns) > self.recent_turns:
+            excess = len(self.turns) - self.recent_turns
+            self._to_summarize.extend(self.turns[:excess])
+            self.turns = self.turns[excess:]
+
+    async def compact(self, summarize_chain):
+        """Fold turns that fell out of the verbatim window into the running summary."""
+        if not self._to_summarize:
+            return
+        folded = self._to_summarize
+        conversation = "\n".join(f"User: {query}\nAssistant: {answer}" for query, answer in folded)
+        try:
+            self.summary = (await summarize_chain.ainvoke({
+                "summary": self.summary or "(none)",
+                "conversation": conversation,
+            })).strip()
+            self._to_summarize = self._to_summarize[len(folded):]
+        except Exception as e:
+            print(f"[ChatSession] Could not summarize history for {self.session_id}: {e}")
+            self._to_summarize = self._to_summarize[-MAX_UNSUMMARIZED_TURNS:]
+
+    def history(self, max_tokens):
+        """
+        Messages to send with the next request: the summary (if any) followed by
+        as many of the most recent turns as fit in max_tokens. The latest turn is
+        always kept; if it alone is over budget it is cut to fit.
+        """
+        budget = max_tokens
+        prefix = []
+        if self.summary:
+            # The summary may use at most half the budget so recent turns still fit
+            summary = self.summary[:max_tokens * 2]
+            prefix = [SystemMessage(content=f"Summary of the earlier conversation: {summary}")]
+            budget -= estimate_tokens(summary)
+
+        recent = []
+        for query, answer in reversed(self.turns):
+            cost = estimate_tokens(query) + estimate_tokens(answer)
+            if cost > budget:
+                if not recent:
+                    # Follow-ups usually refer to the last exchange, so cut it down rather than drop it
+                    query = _clip(query, max(budget, 0) // 2)
+                    answer = _clip(answer, max(budget - estimate_tokens(query), 0))
+                    recent = [HumanMessage(content=query), AIMessage(content=answer)]
+                break
+            recent[:0] = [HumanMessage(content=query), AIMessage(content=answer)]
+            budget -= cost
+        return prefix + recent
+
+
+class SessionStore:
+    """Per-session chat histories with LRU eviction once more than max_sessions are live."""
+
+    def __init__(self, max_sessions=200, recent_turns=4):
+        self.max_sessions = max_sessions
+        self.recent_turns = recent_turns
+        self._sessions = OrderedDict()
+
+    def get(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = ChatSession(session_id, self.recent_turns)
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                evicted_id, _ = self._sessions.popitem(last=False)
+                print(f"[SessionStore] Evicted least recently used session {evicted_id}")
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_used = time.time()
+        return session
+
+    def __len__(self):
+        return len(self._sessions)
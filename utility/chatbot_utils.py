@@ -1,15 +1,28 @@
 import os
+import re
 import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import pymongo
 import certifi
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_chroma import Chroma
+from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.documents import Document
 
-from prompts import CONTEXTUALIZE_Q_SYSTEM_PROMPT, QA_SYSTEM_PROMPT
+from prompts import CONTEXTUALIZE_Q_SYSTEM_PROMPT, QA_SYSTEM_PROMPT, HISTORY_SUMMARY_PROMPT
+from utility.config import (
+    RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL, EMBEDDING_MODEL, RETRIEVAL_MODE, HYBRID_DENSE_TIMEOUT, RRF_K,
+    INCIDENT_SEARCH_MIN_SCORE, INCIDENT_EMBEDDING_FIELD,
+)
+from utility.lexical_index import BM25Index, reciprocal_rank_fusion
+from utility.incident_index import incident_index
+from utility.vector_stores import get_vector_store, get_embeddings
+from utility.metrics import register_stats
 
 # -------------------- CONFIG --------------------
 load_dotenv()
@@ -17,7 +30,6 @@ load_dotenv()
 # --- Chroma Config ---
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PERSIST_DIRECTORY = os.path.join(SCRIPT_DIR, "chroma_db")
-EMBEDDING_MODEL = "models/text-embedding-004"
 LLM_MODEL = "models/gemini-2.5-flash"
 
 # --- MongoDB Config ---
@@ -26,6 +38,76 @@ MONGO_DB_NAME = os.getenv("MONGODB_DB", "mines_safety")
 MONGO_COLLECTION_NAME = os.getenv("MONGODB_COLLECTION", "dgms_reports")
 # ------------------------------------------------
 
+class RetrievalCache:
+    """
+    LRU + TTL cache for retrieval results, keyed by (source, normalized query, k).
+    Retrievals run in executor threads, so every access takes a lock.
+    """
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (stored_at, result)
+        self._lock = threading.Lock()
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+
+    @staticmethod
+    def normalize(query):
+        return re.sub(r"\s+", " ", query.strip().lower()).strip(" ?.!")
+
+    def get(self, source, query, k):
+        key = (source, self.normalize(query), k)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits[source] += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses[source] += 1
+            return False, None
+
+    def put(self, source, query, k, result):
+        key = (source, self.normalize(query), k)
+        with self._lock:
+            self._entries[key] = (time.time(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def fetch(self, source, query, k, compute):
+        """Cached result for (source, query, k), calling compute() on a miss. Empty results are not cached."""
+        found, result = self.get(source, query, k)
+        if found:
+            return result
+        result = compute()
+        if result:
+            self.put(source, query, k, result)
+        return result
+
+    def invalidate(self, source=None):
+        """Drop cached results for one source (e.g. "mongodb" after new incidents land), or everything."""
+        with self._lock:
+            if source is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == source]:
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            sources = set(self.hits) | set(self.misses)
+            return {
+                "entries": len(self._entries),
+                "sources": {s: {"hits": self.hits[s], "misses": self.misses[s]} for s in sorted(sources)},
+            }
+
+
+retrieval_cache = RetrievalCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL)
+register_stats("retrieval_cache", retrieval_cache.stats)
+
 def load_api_key():
     """Loads the Google API Key from the .env file."""
     api_key = os.getenv("GOOGLE_API_KEY")
@@ -42,12 +124,17 @@ def initialize_components(api_key, persist_directory):
 
     try:
         llm = ChatGoogleGenerativeAI(model=LLM_MODEL, google_api_key=api_key)
-        embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=api_key)
-        vector_store = Chroma(persist_directory=persist_directory, embedding_function=embeddings)
+        vector_store = get_vector_store(persist_directory, EMBEDDING_MODEL)
     except Exception as e:
         print(f"Error initializing Google AI components: {e}")
         sys.exit(1)
 
+    if RETRIEVAL_MODE != "dense":
+        try:
+            get_lexical_index(vector_store)  # build now rather than on the first question
+        except Exception as e:
+            print(f"Warning: could not build the lexical index, falling back to dense retrieval: {e}")
+
     try:
         if not MONGO_CONNECTION_STRING:
             print("Error: MONGO_CONNECTION_STRING not found in .env file.")
@@ -86,26 +173,177 @@ def create_manual_chains(llm):
 
     return contextualize_q_chain, qa_chain
 
+def create_summary_chain(llm):
+    """Creates the chain that folds old chat turns into a running summary."""
+    summary_prompt = ChatPromptTemplate.from_template(HISTORY_SUMMARY_PROMPT)
+    return summary_prompt | llm | StrOutputParser()
+
 async def get_standalone_question(chain, chat_history, query):
     if not chat_history:
         return query
     return await chain.ainvoke({"input": query, "chat_history": chat_history})
 
-def retrieve_from_chroma(vector_store, query):
-    print(f"[DEBUG] Retrieving from ChromaDB (PDFs)...")
-    return vector_store.similarity_search_with_relevance_scores(query, k=5)
+# Words that usually point back into the conversation ("what caused it?", "and in that state?")
+REFERENCE_WORDS = {
+    "it", "its", "they", "them", "their", "theirs", "this", "that", "these", "those",
+    "he", "she", "him", "her", "his", "hers", "there", "then", "same", "above",
+    "previous", "earlier", "former", "latter", "again", "else", "more", "other", "another",
+    # words that point back at the conversation itself or at something picked out in it
+    "we", "us", "our", "ours", "you", "your", "one", "ones", "both", "either",
+    "neither", "worse", "worst", "better", "best", "discussion", "conversation",
+    "discussed", "mentioned", "said", "told", "summarize", "summarise", "summary", "recap",
+}
+FOLLOW_UP_OPENERS = (
+    "and ", "what about", "how about", "also ", "why?", "why not", "so ",
+    "summarize", "summarise", "recap", "which one", "which of", "compare",
+)
+
+def is_standalone_query(query, chat_history):
+    """
+    Cheap local check for whether a question can be understood without the chat
+    history, so the contextualization LLM call can be skipped.
+    """
+    if not chat_history:
+        return True
+    normalized = RetrievalCache.normalize(query)
+    words = re.findall(r"[a-z']+", normalized)
+    if len(words) < 3 or normalized.startswith(FOLLOW_UP_OPENERS):
+        return False
+    return not REFERENCE_WORDS.intersection(words)
+
+def similar_questions(a, b, threshold=0.8):
+    """True when two phrasings share almost all their words (Jaccard similarity)."""
+    words_a = set(re.findall(r"\w+", RetrievalCache.normalize(a)))
+    words_b = set(re.findall(r"\w+", RetrievalCache.normalize(b)))
+    if not words_a or not words_b:
+        return words_a == words_b
+    return len(words_a & words_b) / len(words_a | words_b) >= threshold
 
-def retrieve_from_mongodb(collection, query):
+_lexical_indexes = {}  # id(vector_store) -> BM25Index
+_lexical_lock = threading.Lock()
+_dense_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dense-search")
+
+def get_lexical_index(vector_store):
+    """BM25 index over every chunk stored in `vector_store`, built once per store without any embedding calls."""
+    with _lexical_lock:
+        index = _lexical_indexes.get(id(vector_store))
+        if index is None:
+            data = vector_store.get(include=["documents", "metadatas"])
+            index = BM25Index([text or "" for text in data["documents"]], data["metadatas"])
+            _lexical_indexes[id(vector_store)] = index
+            print(f"[DEBUG] Built lexical index over {len(index)} ChromaDB chunks.")
+        return index
+
+def _lexical_search(vector_store, query, k):
+    index = get_lexical_index(vector_store)
+    hits = index.search(query, k)
+    if not hits:
+        return []
+    top = hits[0][1]
+    return [(Document(page_content=index.texts[i], metadata=index.metadatas[i] or {}), score / top) for i, score in hits]
+
+def _hybrid_search(vector_store, query, k):
+    """
+    Dense and BM25 search in parallel, merged with reciprocal rank fusion. Returns
+    (results, complete); complete is False when the dense side was too slow or failed
+    and the results are BM25 only.
+    """
+    dense_future = _dense_pool.submit(vector_store.similarity_search_with_relevance_scores, query, k=k)
+    try:
+        lexical = _lexical_search(vector_store, query, k)
+    except Exception as e:
+        print(f"[DEBUG] Lexical search failed: {e}")
+        lexical = []
+    try:
+        dense = dense_future.result(timeout=HYBRID_DENSE_TIMEOUT)
+    except Exception as e:
+        print(f"[DEBUG] Dense search unavailable ({type(e).__name__}), using lexical results only.")
+        return lexical, False
+
+    docs = {}
+    for doc, _ in dense + lexical:
+        docs.setdefault(doc.page_content, doc)
+    fused = reciprocal_rank_fusion(
+        [[doc.page_content for doc, _ in dense], [doc.page_content for doc, _ in lexical]], k=RRF_K,
+    )[:k]
+    if not fused:
+        return [], True
+    best = fused[0][1]
+    # Scale fused scores to (0, 1] so they mix with the other sources' relevance scores downstream
+    return [(docs[text], score / best) for text, score in fused], True
+
+def retrieve_from_chroma(vector_store, query, k=5, mode=RETRIEVAL_MODE):
+    """(Document, relevance) pairs from the PDF corpus; mode is "hybrid", "dense" or "lexical"."""
+    print(f"[DEBUG] Retrieving from ChromaDB (PDFs, {mode})...")
+    if mode == "lexical":
+        return _lexical_search(vector_store, query, k)
+    if mode == "dense":
+        return retrieval_cache.fetch(
+            "chroma", query, k,
+            lambda: vector_store.similarity_search_with_relevance_scores(query, k=k),
+        )
+    found, result = retrieval_cache.get("chroma", query, k)
+    if found:
+        return result
+    result, complete = _hybrid_search(vector_store, query, k)
+    if result and complete:  # lexical-only fallbacks are not cached, so the next ask gets the full ranking
+        retrieval_cache.put("chroma", query, k, result)
+    return result
+
+def retrieve_from_mongodb(collection, query, k=3):
     print(f"[DEBUG] Retrieving from MongoDB (Real-time)...")
     try:
-        results = collection.find(
-            {"$text": {"$search": query}},
-            {"score": {"$meta": "textScore"}}
-        ).sort([("score", {"$meta": "textScore"})]).limit(3)
-
-        contexts = []
-        for doc in results:
-            context_str = f"""
+        return retrieval_cache.fetch(
+            "mongodb", query, k,
+            lambda: _search_mongodb(collection, query, k),
+        )
+    except Exception as e:
+        print(f"Error querying MongoDB: {e}")
+        return []
+
+def _search_mongodb(collection, query, k):
+    """
+    Vector hits first, topped up with $text matches when there are fewer than k, so
+    incidents that are not in the index yet (e.g. their embedding failed) still turn up.
+    """
+    results = _vector_search_mongodb(collection, query, k)
+    if len(results) < k:
+        seen = {doc_id for doc_id, _ in results}
+        try:
+            results += [(doc_id, text) for doc_id, text in _query_mongodb(collection, query, k) if doc_id not in seen]
+        except Exception as e:
+            if not results:
+                raise
+            print(f"[DEBUG] $text search failed, keeping {len(results)} vector hits: {e}")
+    return [text for _, text in results[:k]]
+
+def _vector_search_mongodb(collection, query, k):
+    """(_id, text) of the incidents nearest to the query in the local incident index; [] if none is close enough or it is unavailable."""
+    try:
+        incident_index.sync(collection)
+        if not len(incident_index):
+            return []
+        hits = [(doc_id, score) for doc_id, score in incident_index.search(get_embeddings().embed_query(query), k)
+                if score >= INCIDENT_SEARCH_MIN_SCORE]
+        if not hits:
+            return []
+        docs = {doc["_id"]: doc for doc in collection.find(
+            {"_id": {"$in": [doc_id for doc_id, _ in hits]}}, {INCIDENT_EMBEDDING_FIELD: 0},
+        )}
+        return [(doc_id, format_incident(docs[doc_id])) for doc_id, _ in hits if doc_id in docs]
+    except Exception as e:
+        print(f"[DEBUG] Incident vector search unavailable, falling back to $text: {e}")
+        return []
+
+def _query_mongodb(collection, query, k):
+    results = collection.find(
+        {"$text": {"$search": query}},
+        {"score": {"$meta": "textScore"}, INCIDENT_EMBEDDING_FIELD: 0}
+    ).sort([("score", {"$meta": "textScore"})]).limit(k)
+    return [(doc["_id"], format_incident(doc)) for doc in results]
+
+def format_incident(doc):
+    return f"""
 Real-time Report ID: {doc.get('report_id')}
 Mine: {doc.get('mine_details', {}).get('name')}, {doc.get('mine_details', {}).get('owner')}
 Accident Date: {doc.get('accident_date')}
@@ -115,11 +353,6 @@ Best Practices/How to Avert: {', '.join(doc.get('best_practices', []))}
 Verification: {doc.get('verification', {}).get('status')}
 Source: {doc.get('source_url')}
 """
-            contexts.append(context_str)
-        return contexts
-    except Exception as e:
-        print(f"Error querying MongoDB: {e}")
-        return []
 
 def format_docs(docs):
     """Helper function to format retrieved LangChain documents into a string."""
@@ -0,0 +1,277 @@
+"""
+Structured DGMS cause and place-of-accident code table (Statement 4.0, pages 26-27 of cause_codes.pdf).
+
+`create_code_table.py` parses the two pages into typed entries and saves them as JSON.
+`CodeTable.lookup` resolves free text to a code by trying, in order:
+    1. exact match on the code or its description,
+    2. keyword/trigram match against the descriptions,
+    3. embedding similarity against the descriptions (only if nothing matched locally).
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utility.config import CAUSE_CODE_PDF, CODE_TABLE_PATH, CODE_TABLE_PAGES
+from utility.embedding_cache import embed_queries
+
+CAUSE = "cause"
+PLACE = "place"
+
+COLUMN_SPLIT = 45  # the statement is laid out in two columns; right-column text starts past this offset
+KEYWORD_THRESHOLD = 0.5
+EMBEDDING_THRESHOLD = 0.55
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "to", "by", "and", "or", "for", "from", "with",
+    "into", "due", "was", "were", "while", "when", "his", "her", "he", "she", "etc", "other", "than",
+    # question words, so chat questions reduce to their content words
+    "what", "which", "who", "why", "how", "where", "did", "does", "do", "is", "are", "be", "been", "has",
+    "had", "have", "there", "any", "about", "this", "that", "it", "its",
+}
+# Words that say nothing about which code applies; a keyword match needs at least one word beyond these
+GENERIC_WORDS = {
+    "accident", "cause", "caused", "incident", "happened", "mine", "mining", "unclassified", "person", "m",
+}
+NEAR_SPELLING_CONTAINMENT = 0.8  # trigram containment that counts as the description misspelt
+
+_ENTRY_RE = re.compile(r"(?<!\S)(\d{3,4})\s{2,}(\S.*?)(?=\s{3,}|$)")
+_HEADING_RE = re.compile(r"(?<!\S)([A-Za-z][^\d]*?)(?=\s{3,}|$)")
+
+
+@dataclass
+class CodeEntry:
+    code: str
+    description: str
+    kind: str              # CAUSE (4 digits) or PLACE (3 digits)
+    group: str = ""        # e.g. "Ground movement", "Long wall panel"
+    area: str = ""         # place codes only: "BELOW GROUND", "OPENCAST", "ABOVE GROUND"
+
+
+def parse_code_pages(page_texts: List[str]) -> List[CodeEntry]:
+    """Parse the text of the Statement 4.0 pages into code entries, in page order."""
+    entries: Dict[str, CodeEntry] = {}
+    for text in page_texts:
+        groups = ["", ""]
+        areas = ["", ""]
+        for line in text.splitlines():
+            if not line.strip() or re.match(r"\s*code\b", line, re.I):
+                continue
+            codes = list(_ENTRY_RE.finditer(line))
+            for match in codes:
+                code, description = match.group(1), match.group(2).strip()
+                column = 0 if match.start() < COLUMN_SPLIT else 1
+                kind = CAUSE if len(code) == 4 else PLACE
+                entries.setdefault(code, CodeEntry(code, description, kind, groups[column], areas[column] if kind == PLACE else ""))
+            taken = [(m.start(), m.end()) for m in codes]
+            for match in _HEADING_RE.finditer(line):
+                if any(start <= match.start() < end for start, end in taken):
+                    continue
+                heading = match.group(1).strip()
+                if not heading or heading.lower().startswith(("statement", "codes for")):
+                    continue
+                column = 0 if match.start() < COLUMN_SPLIT else 1
+                if heading.isupper():
+                    areas[column] = heading
+                    groups[column] = ""
+                else:
+                    groups[column] = heading
+    return list(entries.values())
+
+
+def match_in_text(text: str, query: str, kind: str) -> Optional[CodeEntry]:
+    """
+    The entry of `kind` listed in `text` (e.g. a cause_code_db chunk, which holds a
+    slice of the two-column statement) whose description best matches `query`.
+    None if the text lists no such entry or none of them shares a distinctive word.
+    """
+    entries = [e for e in parse_code_pages([text]) if e.kind == kind]
+    if not entries:
+        return None
+    entry, _ = CodeTable(entries).keyword(query, kind)
+    return entry
+
+
+def _words(text: str) -> List[str]:
+    words = re.findall(r"[a-z]+", text.lower())
+    # crude stemming so "falls"/"fall", "roofs"/"roof" line up
+    return [w[:-1] if len(w) > 3 and w.endswith("s") else w for w in words if w not in STOPWORDS]
+
+
+def _trigrams(text: str) -> set:
+    text = " " + " ".join(_words(text)) + " "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class CodeTable:
+    """In-memory code table with exact, keyword/trigram and embedding lookups."""
+
+    def __init__(self, entries: List[CodeEntry], embeddings=None):
+        self.entries = entries
+        self.embeddings = embeddings  # LangChain Embeddings, used only for the fallback
+        self.by_code = {e.code: e for e in entries}
+        # Descriptions such as "Unclassified" repeat under several groups; only unique ones match exactly
+        keys = [(e.kind, " ".join(_words(e.description))) for e in entries]
+        self.by_description = {k: e for k, e in zip(keys, entries) if keys.count(k) == 1}
+        self._words = [set(_words(f"{e.description} {e.group}")) for e in entries]
+        self._trigrams = [_trigrams(e.description) for e in entries]
+        self._vectors: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def exact(self, text: str, kind: str) -> Optional[CodeEntry]:
+        code = text.strip().lstrip("0") if kind == PLACE else text.strip().zfill(4)
+        entry = self.by_code.get(code)
+        if entry is not None and entry.kind == kind:
+            return entry
+        return self.by_description.get((kind, " ".join(_words(text))))
+
+    def keyword(self, text: str, kind: str) -> Tuple[Optional[CodeEntry], float]:
+        """
+        Best entry by description-word coverage, with trigram containment for near spellings.
+        An entry only counts if it shares a distinctive (non-generic) word with the text, or
+        the text nearly spells out its description; anything else is left to the embeddings.
+        """
+        query_words = set(_words(text))
+        distinctive = query_words - GENERIC_WORDS
+        query_trigrams = _trigrams(text)
+        best, best_score = None, 0.0
+        for entry, words, trigrams in zip(self.entries, self._words, self._trigrams):
+            if entry.kind != kind or not trigrams:
+                continue
+            description_words = set(_words(entry.description))
+            coverage = len(description_words & query_words) / len(description_words) if description_words else 0.0
+            containment = len(trigrams & query_trigrams) / len(trigrams)
+            if not description_words & distinctive and containment < NEAR_SPELLING_CONTAINMENT:
+                continue
+            group_bonus = 0.05 if words - description_words and (words - description_words) & query_words else 0.0
+            score = 0.6 * coverage + 0.4 * containment + group_bonus
+            if score > best_score:
+                best, best_score = entry, score
+        return best, best_score
+
+    def _entry_vectors(self) -> np.ndarray:
+        with self._lock:
+            if self._vectors is None:
+                texts = [f"{e.description} ({e.group})" if e.group else e.description for e in self.entries]
+                vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+                self._vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            return self._vectors
+
+    def embedding(self, text: str, kind: str) -> Tuple[Optional[CodeEntry], float]:
+        if self.embeddings is None:
+            return None, 0.0
+        vectors = self._entry_vectors()
+        query = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        similarities = vectors @ (query / np.linalg.norm(query))
+        mask = np.array([e.kind == kind for e in self.entries])
+        similarities[~mask] = -1.0
+        best = int(np.argmax(similarities))
+        return self.entries[best], float(similarities[best])
+
+    def embedding_batch(self, texts: List[str], kind: str) -> List[Tuple[CodeEntry, float]]:
+        """Nearest entry for every text: one embedding request and one matrix product."""
+        vectors = self._entry_vectors()
+        # Query-side vectors, so a batch scores exactly like embedding() does one text at a time
+        queries = np.asarray(embed_queries(self.embeddings, texts), dtype=np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        similarities = queries @ vectors.T
+        mask = np.array([e.kind == kind for e in self.entries])
+        similarities[:, ~mask] = -1.0
+        best = similarities.argmax(axis=1)
+        return [(self.entries[j], float(similarities[i, j])) for i, j in enumerate(best)]
+
+    def lookup_batch(self, texts: List[str], kind: str) -> List[Optional[Tuple[CodeEntry, float, str]]]:
+        """Like lookup for many texts; the ones with no local match share a single embedding call."""
+        results: List[Optional[Tuple[CodeEntry, float, str]]] = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                continue
+            entry = self.exact(text, kind)
+            if entry is not None:
+                results[i] = (entry, 1.0, "exact")
+                continue
+            entry, score = self.keyword(text, kind)
+            if entry is not None and score >= KEYWORD_THRESHOLD:
+                results[i] = (entry, score, "keyword")
+            else:
+                pending.append(i)
+        if pending and self.embeddings is not None:
+            try:
+                matches = self.embedding_batch([texts[i] for i in pending], kind)
+            except Exception as e:
+                print(f"[ERROR] Code table embedding fallback failed: {e}")
+                return results
+            for i, (entry, score) in zip(pending, matches):
+                if score >= EMBEDDING_THRESHOLD:
+                    results[i] = (entry, score, "embedding")
+        return results
+
+    def lookup(self, text: str, kind: str) -> Optional[Tuple[CodeEntry, float, str]]:
+        """Returns (entry, score, method) with method "exact", "keyword" or "embedding", or None."""
+        if not text or not text.strip():
+            return None
+        entry = self.exact(text, kind)
+        if entry is not None:
+            return entry, 1.0, "exact"
+        entry, score = self.keyword(text, kind)
+        if entry is not None and score >= KEYWORD_THRESHOLD:
+            return entry, score, "keyword"
+        try:
+            entry, score = self.embedding(text, kind)
+        except Exception as e:
+            print(f"[ERROR] Code table embedding fallback failed: {e}")
+            return None
+        if entry is not None and score >= EMBEDDING_THRESHOLD:
+            return entry, score, "embedding"
+        return None
+
+
+def build_code_table(pdf_path=CAUSE_CODE_PDF, output_path=CODE_TABLE_PATH) -> List[CodeEntry]:
+    """Parse the Statement 4.0 pages of the PDF and save the entries as JSON."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    entries = parse_code_pages([reader.pages[i].extract_text() for i in CODE_TABLE_PAGES])
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump([asdict(e) for e in entries], f, indent=2)
+    return entries
+
+
+_table: Optional[CodeTable] = None
+_table_lock = threading.Lock()
+
+
+def load_code_table(embeddings=None) -> Optional[CodeTable]:
+    """
+    The process-wide code table, loaded from CODE_TABLE_PATH (built from the PDF on
+    first use if the JSON is missing). Returns None if neither is available.
+    """
+    global _table
+    with _table_lock:
+        if _table is not None:
+            return _table
+        try:
+            if os.path.exists(CODE_TABLE_PATH):
+                with open(CODE_TABLE_PATH, "r", encoding="utf-8") as f:
+                    entries = [CodeEntry(**e) for e in json.load(f)]
+            elif os.path.exists(CAUSE_CODE_PDF):
+                print(f"Building code table from {CAUSE_CODE_PDF}...")
+                entries = build_code_table()
+            else:
+                print(f"[ERROR] Neither {CODE_TABLE_PATH} nor {CAUSE_CODE_PDF} found; code table unavailable.")
+                return None
+        except Exception as e:
+            print(f"[ERROR] Failed to load code table: {e}")
+            return None
+        _table = CodeTable(entries, embeddings)
+        return _table
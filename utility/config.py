@@ -16,3 +16,110 @@ DATA_DIR = Path("data")
 OUTPUT_SUMMARY_PATH = DATA_DIR / "fatal_reports_summary.json"
 OUTPUT_PARSED_PATH = DATA_DIR / "parsed_reports.json"
 DATA_DIR.mkdir(exist_ok=True, parents=True)
+
+# Embedding provider/model and the cause-code store shared through utility/vector_stores.py.
+# "google" calls the Gemini embedding API; "local" runs a sentence-transformers model on the CPU.
+# Stores must be rebuilt after switching (python rebuild_vector_stores.py).
+EMBEDDING_PROVIDER = os.environ.get("EMBEDDING_PROVIDER", "google")
+EMBEDDING_MODEL = os.environ.get(
+    "EMBEDDING_MODEL", "all-MiniLM-L6-v2" if EMBEDDING_PROVIDER == "local" else "models/text-embedding-004"
+)
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.environ.get("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+LOCAL_EMBEDDING_THREADS = int(os.environ.get("LOCAL_EMBEDDING_THREADS", str(os.cpu_count() or 1)))
+# "flat": serve stores from the memory-mapped flat index written by export_flat_index.py
+# (falling back to Chroma for stores without one); "chroma": always query Chroma
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma")
+# Vector format the flat index searches in memory: "float32", "float16" or "int8"; quantised
+# searches re-score the best FLAT_INDEX_RESCORE * k candidates exactly (0 disables re-scoring)
+FLAT_INDEX_DTYPE = os.environ.get("FLAT_INDEX_DTYPE", "float32")
+FLAT_INDEX_RESCORE = int(os.environ.get("FLAT_INDEX_RESCORE", "4"))
+CAUSE_CODE_DB_DIR = os.environ.get("CAUSE_CODE_DB_DIR", "cause_code_db")
+# Persistent (model, text hash) -> vector cache in front of every embeddings client (EMBEDDING_CACHE=0 to disable)
+EMBEDDING_CACHE = os.environ.get("EMBEDDING_CACHE", "1").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_PATH = Path(os.environ.get("EMBEDDING_CACHE_PATH", str(DATA_DIR / "embedding_cache.db")))
+# Statement 4.0 (cause/place codes) lives on these pages of the PDF; see utility/code_table.py
+CAUSE_CODE_PDF = os.environ.get("CAUSE_CODE_PDF", "cause_codes.pdf")
+CODE_TABLE_PAGES = (26, 27)
+CODE_TABLE_PATH = DATA_DIR / "code_table.json"
+
+# Message bus limits (see utility/agent_framework.py)
+BUS_QUEUE_SIZE = int(os.environ.get("BUS_QUEUE_SIZE", "100"))
+BUS_MAX_CONCURRENCY = int(os.environ.get("BUS_MAX_CONCURRENCY", "4"))
+BUS_POLICY = os.environ.get("BUS_POLICY", "block")
+BUS_BACKGROUND_CONCURRENCY = int(os.environ.get("BUS_BACKGROUND_CONCURRENCY", "1"))
+
+# Seconds in-flight handlers get to finish on shutdown before being cancelled
+SHUTDOWN_DEADLINE = float(os.environ.get("SHUTDOWN_DEADLINE", "30"))
+
+# Bus metrics snapshot written by agent.py and served by app.py at /api/metrics
+METRICS_PATH = DATA_DIR / "bus_metrics.json"
+METRICS_EXPORT_INTERVAL = int(os.environ.get("METRICS_EXPORT_INTERVAL", "10"))
+
+# Durable message log for new_dgms_report/new_news_article (set DURABLE_BUS=0 to disable)
+DURABLE_BUS = os.environ.get("DURABLE_BUS", "1").lower() in ("1", "true", "yes")
+MESSAGE_LOG_PATH = Path(os.environ.get("MESSAGE_LOG_PATH", str(DATA_DIR / "message_log.db")))
+
+# Local broker for `python agent.py --multiprocess`
+IPC_HOST = os.environ.get("IPC_HOST", "127.0.0.1")
+IPC_PORT = int(os.environ.get("IPC_PORT", "8765"))
+# Broker-side log: durable messages are kept here until every subscribing process acks them
+BROKER_LOG_PATH = Path(os.environ.get("BROKER_LOG_PATH", str(DATA_DIR / "message_log_broker.db")))
+# Frames queued per process before the broker treats it as too slow
+IPC_PEER_QUEUE_SIZE = int(os.environ.get("IPC_PEER_QUEUE_SIZE", "1000"))
+
+# Seconds a DGMS report waits for its correlated news scan reply
+NEWS_SCAN_TIMEOUT = int(os.environ.get("NEWS_SCAN_TIMEOUT", "120"))
+
+# Streaming chat endpoint served by the ConversationalAgent (used by app.py and converse.py)
+CHAT_CHANNEL_HOST = os.environ.get("CHAT_CHANNEL_HOST", "127.0.0.1")
+CHAT_CHANNEL_PORT = int(os.environ.get("CHAT_CHANNEL_PORT", "8766"))
+CHAT_TIMEOUT = int(os.environ.get("CHAT_TIMEOUT", "120"))
+CHAT_FRAME_CHARS = int(os.environ.get("CHAT_FRAME_CHARS", "64"))  # 0 relays model chunks as-is
+CHAT_FRAME_INTERVAL = float(os.environ.get("CHAT_FRAME_INTERVAL", "0.05"))
+RETRIEVAL_CACHE_SIZE = int(os.environ.get("RETRIEVAL_CACHE_SIZE", "256"))
+RETRIEVAL_CACHE_TTL = int(os.environ.get("RETRIEVAL_CACHE_TTL", "300"))
+# Seconds each retrieval source may take before the answer goes ahead without it
+RETRIEVAL_BUDGET = float(os.environ.get("RETRIEVAL_BUDGET", "6"))
+RETRIEVAL_TIMEOUTS = {
+    "chroma": float(os.environ.get("RETRIEVAL_TIMEOUT_CHROMA", "5")),
+    "mongodb": float(os.environ.get("RETRIEVAL_TIMEOUT_MONGODB", "4")),
+    "cause_code": float(os.environ.get("RETRIEVAL_TIMEOUT_CAUSE_CODE", "4")),
+    "place_code": float(os.environ.get("RETRIEVAL_TIMEOUT_PLACE_CODE", "4")),
+}
+# Retrieval runs on its own thread pool, so calls abandoned at their deadline cannot starve asyncio.to_thread;
+# once RETRIEVAL_MAX_ABANDONED of them are still running, new retrievals are skipped until some finish
+RETRIEVAL_THREADS = int(os.environ.get("RETRIEVAL_THREADS", "16"))
+RETRIEVAL_MAX_ABANDONED = int(os.environ.get("RETRIEVAL_MAX_ABANDONED", "8"))
+# Token budget per source for the QA context (after dedupe and reranking)
+CONTEXT_BUDGETS = {
+    "chroma": int(os.environ.get("CONTEXT_BUDGET_CHROMA", "1500")),
+    "mongodb": int(os.environ.get("CONTEXT_BUDGET_MONGODB", "700")),
+    "cause_code": int(os.environ.get("CONTEXT_BUDGET_CAUSE_CODE", "400")),
+    "place_code": int(os.environ.get("CONTEXT_BUDGET_PLACE_CODE", "50")),
+}
+# Optional local cross-encoder (e.g. cross-encoder/ms-marco-MiniLM-L-6-v2); empty uses score fusion
+CONTEXT_RERANKER = os.environ.get("CONTEXT_RERANKER", "")
+# "hybrid": dense + BM25 merged with reciprocal rank fusion; "dense": embeddings only;
+# "lexical": BM25 only (no network calls)
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "hybrid")
+HYBRID_DENSE_TIMEOUT = float(os.environ.get("HYBRID_DENSE_TIMEOUT", "3"))  # then answer from BM25 alone
+RRF_K = int(os.environ.get("RRF_K", "60"))
+# Live incidents are searched by embedding (see utility/incident_index.py); $text is the fallback
+INCIDENT_EMBEDDING_FIELD = "embedding"
+INCIDENT_INDEX_SYNC_INTERVAL = float(os.environ.get("INCIDENT_INDEX_SYNC_INTERVAL", "30"))
+INCIDENT_SEARCH_MIN_SCORE = float(os.environ.get("INCIDENT_SEARCH_MIN_SCORE", "0.35"))  # cosine similarity
+# Seconds below the newest updated_at that every sync re-reads: embeddings are stamped by the writer's
+# clock before the insert commits, so concurrent writers can land rows a little behind the watermark
+INCIDENT_INDEX_LOOKBACK = float(os.environ.get("INCIDENT_INDEX_LOOKBACK", "600"))
+INCIDENT_INDEX_EMBED_BATCH = int(os.environ.get("INCIDENT_INDEX_EMBED_BATCH", "16"))  # missing embeddings filled per background pass
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+ANSWER_CACHE_TTL = int(os.environ.get("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", "500"))
+# "auto": skip the question rewrite for queries that stand alone and overlap it with retrieval otherwise;
+# "always": rewrite first, then retrieve
+CHAT_REWRITE_MODE = os.environ.get("CHAT_REWRITE_MODE", "auto")
+CHAT_MAX_SESSIONS = int(os.environ.get("CHAT_MAX_SESSIONS", "200"))
+CHAT_HISTORY_TURNS = int(os.environ.get("CHAT_HISTORY_TURNS", "4"))  # turns kept verbatim; older ones are summarized
+CHAT_HISTORY_TOKEN_BUDGET = int(os.environ.get("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+# user_query handlers running at once; turns queued behind a busy session do not take a slot
+CHAT_QUERY_CONCURRENCY = int(os.environ.get("CHAT_QUERY_CONCURRENCY", "32"))
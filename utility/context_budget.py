@@ -0,0 +1,166 @@
+"""
+Context assembly for the RAG chatbot: dedupe retrieved chunks, rerank them against
+the question and trim each source to a token budget before they go into the QA prompt.
+"""
+from __future__ import annotations
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+try:  # optional dependency; we fall back to score fusion if unavailable
+    from sentence_transformers import CrossEncoder  # type: ignore
+except Exception:  # pragma: no cover
+    CrossEncoder = None  # type: ignore
+
+MIN_OVERLAP_CHARS = 80      # shorter shared prefixes/suffixes are left alone
+NEAR_DUPLICATE_JACCARD = 0.8
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token); good enough for budgeting prompts."""
+    return len(text) // 4 + 1
+
+
+@dataclass
+class Chunk:
+    source: str
+    text: str
+    score: Optional[float] = None  # native retriever score, higher is better
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _shingles(text: str, size: int = 5) -> set:
+    words = _normalize(text).split()
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _overlap_at(first: str, second: str) -> int:
+    """Position in `first` where its tail equals the start of `second`, or -1."""
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return -1
+    pos = first.find(probe)
+    while pos != -1:
+        if second.startswith(first[pos:]):
+            return pos
+        pos = first.find(probe, pos + 1)
+    return -1
+
+
+def _strip_overlap(kept: str, text: str) -> str:
+    """Drop the part of `text` that repeats a kept neighbouring chunk (splitter chunk overlap)."""
+    pos = _overlap_at(kept, text)
+    if pos != -1:
+        return text[len(kept) - pos:].lstrip()
+    pos = _overlap_at(text, kept)
+    if pos != -1:
+        return text[:pos].rstrip()
+    return text
+
+
+def dedupe(chunks: List[Chunk]) -> List[Chunk]:
+    """
+    Removes exact and near-duplicate chunks (keeping the first, i.e. best-ranked, copy)
+    and trims text that overlaps an already kept chunk of the same source.
+    """
+    kept: List[Chunk] = []
+    kept_shingles: List[set] = []
+    for chunk in chunks:
+        text = chunk.text
+        for other in kept:
+            if other.source == chunk.source:
+                text = _strip_overlap(other.text, text)
+        if not text.strip():
+            continue
+        shingles = _shingles(text)
+        if any(len(shingles & seen) / len(shingles | seen) >= NEAR_DUPLICATE_JACCARD for seen in kept_shingles):
+            continue
+        kept.append(Chunk(chunk.source, text, chunk.score))
+        kept_shingles.append(shingles)
+    return kept
+
+
+class Reranker:
+    """
+    Orders chunks by relevance to the question. Uses a local cross-encoder when
+    sentence-transformers is installed and a model is configured; otherwise fuses the
+    retriever's own score with lexical overlap between question and chunk.
+    """
+
+    def __init__(self, model_name: str = "", retriever_weight: float = 0.5):
+        self.model_name = model_name
+        self.retriever_weight = retriever_weight
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _cross_encoder(self):
+        if not self.model_name or CrossEncoder is None:
+            return None
+        with self._lock:
+            if self._model is None:
+                self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    @staticmethod
+    def _lexical_score(query_terms: set, text: str) -> float:
+        if not query_terms:
+            return 0.0
+        terms = set(re.findall(r"\w+", _normalize(text)))
+        return len(query_terms & terms) / len(query_terms)
+
+    def scores(self, query: str, chunks: List[Chunk]) -> List[float]:
+        model = self._cross_encoder()
+        if model is not None:
+            return [float(s) for s in model.predict([(query, c.text) for c in chunks])]
+
+        query_terms = {t for t in re.findall(r"\w+", _normalize(query)) if len(t) > 2}
+        fused = []
+        for chunk in chunks:
+            lexical = self._lexical_score(query_terms, chunk.text)
+            if chunk.score is None:
+                fused.append(lexical)
+            else:
+                fused.append(self.retriever_weight * chunk.score + (1 - self.retriever_weight) * lexical)
+        return fused
+
+    def rerank(self, query: str, chunks: List[Chunk]) -> List[Chunk]:
+        if len(chunks) < 2:
+            return list(chunks)
+        scores = self.scores(query, chunks)
+        order = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+        return [chunks[i] for i in order]
+
+
+def trim_to_budget(chunks: List[Chunk], budgets: Dict[str, int]) -> Dict[str, List[str]]:
+    """
+    Takes chunks in ranked order until each source's token budget is spent.
+    If a source's best chunk alone is over budget, it is cut to fit rather than dropped.
+    """
+    remaining = dict(budgets)
+    selected: Dict[str, List[str]] = {}
+    for chunk in chunks:
+        budget = remaining.get(chunk.source)
+        if budget is None:
+            selected.setdefault(chunk.source, []).append(chunk.text)
+            continue
+        cost = estimate_tokens(chunk.text)
+        if cost <= budget:
+            selected.setdefault(chunk.source, []).append(chunk.text)
+            remaining[chunk.source] = budget - cost
+        elif chunk.source not in selected and budget > 0:
+            selected[chunk.source] = [chunk.text[:budget * 4].rsplit(" ", 1)[0] + " ..."]
+            remaining[chunk.source] = 0
+    return selected
+
+
+def assemble_context(query: str, chunks: List[Chunk], budgets: Dict[str, int], reranker: Reranker) -> Dict[str, List[str]]:
+    """Rerank, dedupe and trim retrieved chunks; returns the kept texts per source, best first."""
+    ranked = reranker.rerank(query, chunks)
+    return trim_to_budget(dedupe(ranked), budgets)
@@ -0,0 +1,145 @@
+import hashlib
+import inspect
+import sqlite3
+import threading
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+QUERY = "query"
+DOCUMENT = "document"
+
+
+def embed_queries(embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Query-side embeddings for many texts: the same vectors embed_query gives, but batched
+    where the client allows it (asymmetric models such as Gemini embed queries and
+    documents with different task types, so embed_documents is not a substitute).
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    if "task_type" in inspect.signature(embeddings.embed_documents).parameters:
+        return embeddings.embed_documents(texts, task_type="RETRIEVAL_QUERY")
+    return [embeddings.embed_query(text) for text in texts]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Disk-backed cache in front of any LangChain Embeddings object.
+
+    Vectors are stored in SQLite keyed by (model, kind, sha256 of the text); kind
+    separates query and document embeddings because providers such as Gemini embed
+    them with different task types. Misses from one embed_documents call are sent
+    to the wrapped client in a single batch. Usable anywhere an Embeddings object is.
+    """
+
+    def __init__(self, embeddings, model, path):
+        self.embeddings = embeddings
+        self.model = model
+        self.path = str(path)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (model, kind, text_hash)
+            )
+            """
+        )
+
+    @staticmethod
+    def _hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _as_stored(vectors):
+        # Round to float32 up front so a miss returns exactly what later hits will
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def _load(self, kind, hashes):
+        found = {}
+        with self._lock:
+            # SQLite caps bound parameters, so look hashes up in slices
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND kind = ? "
+                    f"AND text_hash IN ({','.join('?' * len(batch))})",
+                    [self.model, kind, *batch],
+                ).fetchall()
+                found.update((h, np.frombuffer(blob, dtype=np.float32).tolist()) for h, blob in rows)
+        return found
+
+    def _store(self, kind, hashes, vectors):
+        now = time.time()
+        rows = [
+            (self.model, kind, h, np.asarray(v, dtype=np.float32).tobytes(), now)
+            for h, v in zip(hashes, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [self._hash(t) for t in texts]
+        found = self._load(DOCUMENT, list(set(hashes)))
+        missing = {}
+        for text, h in zip(texts, hashes):
+            if h not in found:
+                missing.setdefault(h, text)
+        self.hits += len(texts) - sum(1 for h in hashes if h in missing)
+        self.misses += len(missing)
+        if missing:
+            vectors = self._as_stored(self.embeddings.embed_documents(list(missing.values())))
+            self._store(DOCUMENT, list(missing), vectors)
+            found.update(zip(missing, vectors))
+        return [list(found[h]) for h in hashes]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Like embed_query for many texts; misses go to the wrapped client in one batch."""
+        hashes = [self._hash(t) for t in texts]
+        found = self._load(QUERY, list(set(hashes)))
+        missing = {}
+        for text, h in zip(texts, hashes):
+            if h not in found:
+                missing.setdefault(h, text)
+        self.hits += len(texts) - sum(1 for h in hashes if h in missing)
+        self.misses += len(missing)
+        if missing:
+            vectors = self._as_stored(embed_queries(self.embeddings, list(missing.values())))
+            self._store(QUERY, list(missing), vectors)
+            found.update(zip(missing, vectors))
+        return [list(found[h]) for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        h = self._hash(text)
+        found = self._load(QUERY, [h])
+        if h in found:
+            self.hits += 1
+            return found[h]
+        self.misses += 1
+        vector = self._as_stored([self.embeddings.embed_query(text)])[0]
+        self._store(QUERY, [h], [vector])
+        return vector
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (self.model,)).fetchone()[0]
+        return {"model": self.model, "entries": entries, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,226 @@
+"""
+Flat (brute-force) vector index exported from a Chroma store.
+
+The stores here hold a few thousand chunks at most, so a single matrix product over
+all normalised vectors answers a query faster than Chroma's SQLite + HNSW path.
+`export_flat_index` writes `flat_index.npy` (float32, memory-mapped on load) and a
+`flat_index.json` sidecar with ids, texts and metadata into the store's directory;
+`FlatVectorStore` answers the same calls the tools make on a Chroma store.
+
+The export also writes float16 and int8 (per-dimension scalar quantised) copies.
+Loaded with dtype="float16" or "int8", only the compressed copy is held in memory:
+candidates are ranked on it and the best `rescore * k` are re-scored exactly against
+the float32 rows, which stay memory-mapped on disk.
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from utility.embedding_cache import embed_queries
+
+VECTORS_FILE = "flat_index.npy"
+SIDECAR_FILE = "flat_index.json"
+QUANTIZED_DTYPES = ("float16", "int8")
+BLOCK_ROWS = 8192  # quantised rows are widened to float32 a block at a time when scoring
+
+
+def _codes_file(dtype):
+    return f"flat_index.{dtype}.npy"
+
+
+def _scale_file(dtype):
+    return f"flat_index.{dtype}.scale.npy"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """(codes, scale) for float16 or int8; int8 uses a symmetric per-dimension scale."""
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scale = np.abs(vectors).max(axis=0) / 127.0 if len(vectors) else np.ones(vectors.shape[1:], np.float32)
+        scale[scale == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+        return codes, scale.astype(np.float32)
+    raise ValueError(f"Unknown flat index dtype: {dtype!r} (expected one of {QUANTIZED_DTYPES})")
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Column indices and values of the k largest scores in every row, best first."""
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def has_flat_index(directory) -> bool:
+    return os.path.exists(os.path.join(directory, VECTORS_FILE)) and os.path.exists(os.path.join(directory, SIDECAR_FILE))
+
+
+def export_flat_index(vector_store, directory, provider="", model="") -> int:
+    """Write the store's vectors and documents as a flat index into `directory`; returns the row count."""
+    data = vector_store.get(include=["embeddings", "documents", "metadatas"])
+    vectors = _normalize(np.asarray(data["embeddings"], dtype=np.float32))
+    np.save(os.path.join(directory, VECTORS_FILE), vectors)
+    for dtype in QUANTIZED_DTYPES:
+        codes, scale = quantize(vectors, dtype)
+        np.save(os.path.join(directory, _codes_file(dtype)), codes)
+        if scale is not None:
+            np.save(os.path.join(directory, _scale_file(dtype)), scale)
+    with open(os.path.join(directory, SIDECAR_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "provider": provider,
+            "model": model,
+            "dimension": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+            "ids": list(data["ids"]),
+            "documents": [text or "" for text in data["documents"]],
+            "metadatas": [m or {} for m in data["metadatas"]],
+        }, f)
+    return len(vectors)
+
+
+class FlatIndex:
+    """
+    Normalised vectors plus their documents; top-k by cosine similarity with argpartition.
+    If `codes` is given (float16, or int8 with `scale`), ranking runs on the codes and
+    the top `rescore * k` candidates are re-scored on `vectors`; rescore=0 skips that.
+    """
+
+    def __init__(self, vectors: np.ndarray, ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[dict],
+                 codes: Optional[np.ndarray] = None, scale: Optional[np.ndarray] = None, rescore: int = 4):
+        self.vectors = vectors
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        self.codes = codes
+        self.scale = scale
+        self.rescore = rescore
+        self.info = {}  # provider/model/dimension from the sidecar, when loaded from disk
+
+    @classmethod
+    def load(cls, directory, dtype: str = "float32", rescore: int = 4) -> "FlatIndex":
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")
+        with open(os.path.join(directory, SIDECAR_FILE), "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        codes = scale = None
+        if dtype != "float32":
+            codes_path = os.path.join(directory, _codes_file(dtype))
+            if not os.path.exists(codes_path):
+                raise FileNotFoundError(f"{codes_path} not found; re-run export_flat_index.py")
+            codes = np.load(codes_path)  # resident; the float32 rows are only paged in for re-scoring
+            if dtype == "int8":
+                scale = np.load(os.path.join(directory, _scale_file(dtype)))
+        index = cls(vectors, sidecar["ids"], sidecar["documents"], sidecar["metadatas"], codes, scale, rescore)
+        index.info = {key: sidecar.get(key) for key in ("provider", "model", "dimension")}
+        if len(vectors) != len(index.ids) or (vectors.ndim == 2 and index.info["dimension"] not in (None, vectors.shape[1])):
+            raise ValueError(f"Flat index in {directory} does not match its sidecar; re-run export_flat_index.py")
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dtype(self) -> str:
+        return "float32" if self.codes is None else str(self.codes.dtype)
+
+    def memory_bytes(self) -> int:
+        """Bytes of vector data scanned on every query (the codes when quantised)."""
+        if self.codes is None:
+            return int(self.vectors.nbytes)
+        return int(self.codes.nbytes) + (int(self.scale.nbytes) if self.scale is not None else 0)
+
+    def _approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        if self.codes is None:
+            return queries @ self.vectors.T
+        scaled = queries * self.scale if self.scale is not None else queries
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), BLOCK_ROWS):
+            block = self.codes[start:start + BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = scaled @ block.T
+        return scores
+
+    def search_batch(self, queries, k: int) -> List[List[Tuple[int, float]]]:
+        """Top-k (row, cosine similarity) for every query vector, best first."""
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        if not len(self):
+            return [[] for _ in queries]
+        if queries.shape[1] != self.vectors.shape[1]:
+            raise ValueError(
+                f"Query vectors have {queries.shape[1]} dimensions but the flat index has {self.vectors.shape[1]}; "
+                f"the configured embedding model does not match the export (re-run export_flat_index.py)."
+            )
+        k = min(k, len(self))
+        scores = self._approximate_scores(queries)
+        if self.codes is None or self.rescore <= 0:
+            top, top_scores = _top_k(scores, k)
+            return [[(int(i), float(s)) for i, s in zip(rows, row_scores)] for rows, row_scores in zip(top, top_scores)]
+
+        candidates, _ = _top_k(scores, min(len(self), k * self.rescore))
+        results = []
+        for query, rows in zip(queries, candidates):
+            rows = np.sort(rows)  # ascending row order reads the memory-mapped file sequentially
+            exact = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+            best, best_scores = _top_k(exact[None, :], k)
+            results.append([(int(rows[i]), float(s)) for i, s in zip(best[0], best_scores[0])])
+        return results
+
+    def search(self, query, k: int) -> List[Tuple[int, float]]:
+        return self.search_batch([query], k)[0]
+
+    def document(self, row: int) -> Document:
+        return Document(page_content=self.documents[row], metadata=self.metadatas[row], id=self.ids[row])
+
+
+class FlatVectorStore:
+    """
+    Read-only stand-in for a Chroma store backed by a FlatIndex. Relevance scores are
+    cosine similarities.
+    """
+
+    def __init__(self, index: FlatIndex, embeddings):
+        self.index = index
+        self.embeddings = embeddings
+
+    @classmethod
+    def load(cls, directory, embeddings, dtype="float32", rescore=4, provider="", model="") -> "FlatVectorStore":
+        """
+        Raises ValueError if the index was exported with a different provider/model than
+        the one given, since its vectors would not be comparable with the query embeddings.
+        """
+        index = FlatIndex.load(directory, dtype, rescore)
+        exported = (index.info.get("provider") or "", index.info.get("model") or "")
+        for wanted, found in zip((provider, model), exported):
+            if wanted and found and wanted != found:
+                raise ValueError(
+                    f"Flat index in {directory} was exported with {exported[0]}/{exported[1]} "
+                    f"but {provider}/{model} is configured; re-run export_flat_index.py."
+                )
+        return cls(index, embeddings)
+
+    def get(self, include=None):
+        return {"ids": self.index.ids, "documents": self.index.documents, "metadatas": self.index.metadatas}
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        hits = self.index.search(self.embeddings.embed_query(query), k)
+        return [(self.index.document(row), score) for row, score in hits]
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k)]
+
+    def similarity_search_batch(self, queries: List[str], k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """Many queries with one embedding request and one matrix product."""
+        if not queries:
+            return []
+        # Query-side vectors in one batch, so scores match similarity_search_with_relevance_scores
+        hits = self.index.search_batch(embed_queries(self.embeddings, queries), k)
+        return [[(self.index.document(row), score) for row, score in rows] for rows in hits]
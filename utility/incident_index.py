@@ -0,0 +1,189 @@
+"""
+Embeddings of live MongoDB incidents and an in-process flat index over them.
+
+Incidents get an `embedding` field ({"vector", "model", "updated_at"}) when they are
+inserted by `scrape_reports.process_link` or `AddIncidentToDBTool`; older documents
+are filled in by `python -m utility.tools.backfill_incident_embeddings`, and the incident
+analysis agent calls `IncidentIndex.embed_missing` in the background for documents that
+are still missing one (e.g. because embedding failed at insert). The index pulls only embeddings stamped after its
+watermark minus INCIDENT_INDEX_LOOKBACK, so a write that committed late is still
+picked up; keeping it current costs one small query, and search is a FlatIndex matrix product.
+"""
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from pymongo import UpdateOne
+
+from utility.config import (
+    EMBEDDING_MODEL, INCIDENT_EMBEDDING_FIELD, INCIDENT_INDEX_SYNC_INTERVAL, INCIDENT_INDEX_LOOKBACK,
+    INCIDENT_INDEX_EMBED_BATCH,
+)
+from utility.flat_index import FlatIndex
+from utility.metrics import register_stats
+from utility.vector_stores import get_embeddings
+
+# Fields incident_text reads, for queries that fetch documents to embed
+INCIDENT_TEXT_PROJECTION = {"report_id": 1, "mine_details": 1, "incident_details.brief_cause": 1, "summary": 1}
+
+
+def incident_text(doc: dict) -> str:
+    """The text an incident is embedded from: brief cause, summary, and mine and location."""
+    mine = doc.get("mine_details") or {}
+    details = doc.get("incident_details") or {}
+    parts = [
+        details.get("brief_cause"),
+        doc.get("summary"),
+        ", ".join(p for p in (mine.get("name"), mine.get("district"), mine.get("state")) if p),
+    ]
+    return "\n".join(p.strip() for p in parts if p and p.strip())
+
+
+def incident_embeddings(docs: List[dict], embeddings=None) -> List[Optional[dict]]:
+    """
+    The `embedding` field value for each document (None for documents with no text),
+    embedded in one request. Raises if the embedding call fails.
+    """
+    embeddings = embeddings or get_embeddings()
+    texts = [incident_text(doc) for doc in docs]
+    present = [i for i, text in enumerate(texts) if text]
+    results: List[Optional[dict]] = [None] * len(docs)
+    if not present:
+        return results
+    vectors = embeddings.embed_documents([texts[i] for i in present])
+    now = time.time()
+    for i, vector in zip(present, vectors):
+        results[i] = {"vector": [float(x) for x in vector], "model": EMBEDDING_MODEL, "updated_at": now}
+    return results
+
+
+def incident_embedding(doc: dict) -> Optional[dict]:
+    """Like incident_embeddings for one document, but returns None instead of raising."""
+    try:
+        return incident_embeddings([doc])[0]
+    except Exception as e:
+        print(f"Warning: could not embed incident: {e}")
+        return None
+
+
+class IncidentIndex:
+    """
+    Flat index of incident embeddings keyed by Mongo _id, synced incrementally:
+    at most every `sync_interval` seconds, or on the next search after mark_stale().
+    """
+
+    def __init__(self, model=EMBEDDING_MODEL, sync_interval=30, lookback=600.0, embed_batch=16):
+        self.model = model
+        self.sync_interval = sync_interval
+        self.lookback = lookback
+        self.embed_batch = embed_batch
+        self._ids = []
+        self._rows = {}  # _id -> row in the index
+        self._stamps = {}  # _id -> embedding.updated_at of its row
+        self._vectors = None
+        self._index: Optional[FlatIndex] = None
+        self._watermark = 0.0  # newest embedding.updated_at seen
+        self._last_sync = 0.0
+        self._unembeddable = set()  # _ids with no text to embed
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def mark_stale(self):
+        """Called when new incidents land, so the next search picks them up."""
+        self._stale = True
+
+    def sync(self, collection, force=False) -> int:
+        """Pull embeddings added or changed since the last sync; returns how many."""
+        with self._lock:
+            if not (force or self._stale or time.time() - self._last_sync >= self.sync_interval):
+                return 0
+            field = INCIDENT_EMBEDDING_FIELD
+            # Stamps come from the writers' clocks before their inserts commit, so re-read a window
+            # below the watermark; rows already indexed with the same stamp are skipped
+            since = self._watermark - self.lookback if self._watermark else 0.0
+            cursor = collection.find(
+                {f"{field}.model": self.model, f"{field}.updated_at": {"$gte": since}},
+                {field: 1},
+            )
+            new_ids, new_vectors, replaced = [], [], 0
+            for doc in cursor:
+                embedding = doc[field]
+                seen = self._stamps.get(doc["_id"])
+                if seen is not None and embedding["updated_at"] <= seen:
+                    continue
+                self._stamps[doc["_id"]] = embedding["updated_at"]
+                vector = np.asarray(embedding["vector"], dtype=np.float32)
+                vector /= np.linalg.norm(vector) or 1.0
+                self._watermark = max(self._watermark, embedding["updated_at"])
+                row = self._rows.get(doc["_id"])
+                if row is not None:
+                    self._vectors[row] = vector
+                    replaced += 1
+                else:
+                    self._rows[doc["_id"]] = len(self._ids) + len(new_ids)
+                    new_ids.append(doc["_id"])
+                    new_vectors.append(vector)
+            if new_ids:
+                stacked = np.vstack(new_vectors)
+                self._vectors = stacked if self._vectors is None else np.vstack([self._vectors, stacked])
+                self._ids.extend(new_ids)
+            n = len(self._ids)
+            if new_ids or replaced or self._index is None:
+                vectors = self._vectors if self._vectors is not None else np.empty((0, 0), dtype=np.float32)
+                self._index = FlatIndex(vectors, self._ids, [""] * n, [{}] * n)
+            self._last_sync = time.time()
+            self._stale = False
+            if new_ids or replaced:
+                print(f"[IncidentIndex] Synced {len(new_ids)} new and {replaced} updated incident embeddings ({n} total).")
+            return len(new_ids) + replaced
+
+    def embed_missing(self, collection) -> int:
+        """
+        Embed and store up to embed_batch incidents that have no embedding for this model.
+        Makes an embedding request and a bulk write, so it belongs in a background loop,
+        not on the search path; the next sync picks the new embeddings up.
+        """
+        if self.model != EMBEDDING_MODEL or self.embed_batch <= 0:
+            return 0  # incident_embeddings always embeds with the configured model
+        field = INCIDENT_EMBEDDING_FIELD
+        try:
+            docs = list(collection.find(
+                {f"{field}.model": {"$ne": self.model}, "_id": {"$nin": list(self._unembeddable)}},
+                INCIDENT_TEXT_PROJECTION,
+            ).limit(self.embed_batch))
+            if not docs:
+                return 0
+            updates = []
+            for doc, embedding in zip(docs, incident_embeddings(docs)):
+                if embedding is None:
+                    self._unembeddable.add(doc["_id"])
+                else:
+                    updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {field: embedding}}))
+            if updates:
+                collection.bulk_write(updates, ordered=False)
+                self.mark_stale()
+                print(f"[IncidentIndex] Embedded {len(updates)} incidents that had no {self.model} embedding.")
+            return len(updates)
+        except Exception as e:
+            print(f"[IncidentIndex] Could not embed incidents missing an embedding: {e}")
+            return 0
+
+    def search(self, query_vector, k: int) -> List[Tuple[object, float]]:
+        """Top-k (Mongo _id, cosine similarity), best first."""
+        index = self._index
+        if index is None or not len(index):
+            return []
+        return [(index.ids[row], score) for row, score in index.search(query_vector, k)]
+
+    def stats(self):
+        return {"incidents": len(self), "model": self.model, "last_sync": self._last_sync}
+
+
+incident_index = IncidentIndex(
+    EMBEDDING_MODEL, INCIDENT_INDEX_SYNC_INTERVAL, INCIDENT_INDEX_LOOKBACK, INCIDENT_INDEX_EMBED_BATCH
+)
+register_stats("incident_index", incident_index.stats)
@@ -0,0 +1,232 @@
+"""
+Local IPC transport for running each agent in its own OS process.
+
+A BusBroker listens on a localhost TCP socket and routes published messages
+to every connected process that subscribed to that message type. Inside each
+process a RemoteMessageBus keeps the normal MessageBus API (publish/subscribe/run),
+so agents do not know whether their peers are in-process or not. Delivered
+messages go through the local bus, so per-subscription queues, priority lanes,
+metrics and the durable log all still apply on the receiving side.
+
+With a MessageLog, the broker also persists durable message types as they are
+published, pending for every process that has ever subscribed to the type (keyed
+by process name). A process acks once the message is queued (and logged) on its
+own bus; whatever is unacked is redelivered when it next connects. Each process
+gets a bounded outbound queue, so a slow subscriber never stalls a publisher.
+
+Frames are newline-delimited JSON objects:
+    {"op": "hello", "name": "<process name>"}
+    {"op": "subscribe", "type": "<message type>"}
+    {"op": "ready"}                                    (client -> broker, after its subscribes)
+    {"op": "publish", "message": {...}}                (client -> broker)
+    {"op": "deliver", "message": {...}, "offset": n}   (broker -> client; offset only for durable types)
+    {"op": "ack", "offset": n}                         (client -> broker)
+"""
+import asyncio
+import json
+from collections import defaultdict
+
+from utility.agent_framework import MessageBus, priority_for
+
+MAX_FRAME_BYTES = 16 * 1024 * 1024  # DGMS documents can be large
+RECONNECT_DELAY = 1.0
+PEER_QUEUE_SIZE = 1000  # frames buffered per process before it counts as too slow
+
+
+def encode_frame(frame):
+    return (json.dumps(frame, default=str) + "\n").encode("utf-8")
+
+
+async def read_frames(reader):
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"[IPC] Dropping malformed frame: {e}")
+
+
+class _Peer:
+    def __init__(self, writer, name="?"):
+        self.writer = writer
+        self.name = name
+        self._lock = asyncio.Lock()
+
+    async def send(self, frame):
+        async with self._lock:
+            self.writer.write(encode_frame(frame))
+            await self.writer.drain()
+
+
+class _OutboundPeer(_Peer):
+    """Broker side of a connection: frames go through a bounded queue drained by a writer task."""
+
+    def __init__(self, writer, name="?", maxsize=PEER_QUEUE_SIZE):
+        super().__init__(writer, name)
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self._writer_task = asyncio.create_task(self._write_loop())
+
+    async def _write_loop(self):
+        try:
+            while True:
+                await self.send(await self.queue.get())
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    def offer(self, frame):
+        """Queue a frame without waiting; False if the queue is full."""
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    def close(self):
+        self._writer_task.cancel()
+        self.writer.close()
+
+
+class BusBroker:
+    """Routes messages between agent processes connected over localhost TCP."""
+
+    def __init__(self, host, port, log=None, queue_size=PEER_QUEUE_SIZE):
+        self.host = host
+        self.port = port
+        self.log = log  # optional utility.message_log.MessageLog for durable message types
+        self.queue_size = queue_size
+        self.routes = defaultdict(set)
+
+    async def serve_forever(self):
+        if self.log is not None:
+            await asyncio.to_thread(self.log.compact)
+        server = await asyncio.start_server(self._on_connect, self.host, self.port, limit=MAX_FRAME_BYTES)
+        print(f"[IPC] Broker listening on {self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+    async def _on_connect(self, reader, writer):
+        peer = _OutboundPeer(writer, maxsize=self.queue_size)
+        try:
+            async for frame in read_frames(reader):
+                op = frame.get("op")
+                if op == "hello":
+                    peer.name = frame.get("name", "?")
+                    print(f"[IPC] Process '{peer.name}' connected.")
+                elif op == "subscribe":
+                    self.routes[frame["type"]].add(peer)
+                    if self.log is not None and self.log.is_durable(frame["type"]):
+                        await asyncio.to_thread(self.log.add_subscriber, frame["type"], peer.name)
+                elif op == "ready":
+                    await self._redeliver(peer)
+                elif op == "publish":
+                    await self._route(frame["message"])
+                elif op == "ack" and self.log is not None:
+                    await asyncio.to_thread(self.log.ack, frame["offset"], peer.name)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            print(f"[IPC] Connection to '{peer.name}' lost: {e}")
+        finally:
+            for peers in self.routes.values():
+                peers.discard(peer)
+            peer.close()
+            print(f"[IPC] Process '{peer.name}' disconnected.")
+
+    async def _redeliver(self, peer):
+        """Send a (re)connected process the durable messages it has not acked yet."""
+        if self.log is None:
+            return
+        pending = await asyncio.to_thread(self.log.unacked, peer.name)
+        for offset, message in pending:
+            print(f"[IPC] Redelivering {message.get('type')} (offset {offset}) to '{peer.name}'")
+            await peer.queue.put({"op": "deliver", "message": message, "offset": offset})
+
+    async def _route(self, message):
+        message_type = message.get("type")
+        frame = {"op": "deliver", "message": message}
+        durable = self.log is not None and self.log.is_durable(message_type)
+        if durable:
+            subscribers = await asyncio.to_thread(self.log.subscribers, message_type)
+            if subscribers:
+                frame["offset"] = await asyncio.to_thread(self.log.append, message, subscribers)
+        for peer in list(self.routes.get(message_type, ())):
+            if peer.offer(frame):
+                continue
+            if "offset" in frame:
+                # Still pending in the log: disconnect the laggard so it catches up on reconnect
+                print(f"[IPC] '{peer.name}' is not keeping up; disconnecting it to redeliver from the log.")
+                peer.close()
+            else:
+                print(f"[IPC] '{peer.name}' is not keeping up; dropped {message_type} ({peer.dropped} dropped so far).")
+
+
+class RemoteMessageBus(MessageBus):
+    """A MessageBus whose publish/subscribe traffic goes through a BusBroker."""
+
+    def __init__(self, host, port, name, **bus_options):
+        super().__init__(**bus_options)
+        self.host = host
+        self.port = port
+        self.name = name
+        self._peer = None
+        self._connected = asyncio.Event()
+        self._reply_types = set()
+
+    async def publish(self, message):
+        message.setdefault("priority", priority_for(message.get("type")))
+        self._mark_follow_on(message)
+        self.metrics.record_publish(message)
+        await self._connected.wait()
+        await self._peer.send({"op": "publish", "message": message})
+
+    def subscribe(self, message_type, callback, **options):
+        subscription = super().subscribe(message_type, callback, **options)
+        if self._peer is not None:
+            asyncio.ensure_future(self._peer.send({"op": "subscribe", "type": message_type}))
+        return subscription
+
+    async def _expect_replies(self, reply_type):
+        # The broker only forwards types we subscribed to, so register reply types too
+        if reply_type in self._reply_types:
+            return
+        self._reply_types.add(reply_type)
+        await self._connected.wait()
+        await self._peer.send({"op": "subscribe", "type": reply_type})
+
+    async def run(self):
+        scheduler = asyncio.create_task(super().run())
+        try:
+            while True:
+                await self._connect_and_listen()
+                await asyncio.sleep(RECONNECT_DELAY)
+        finally:
+            scheduler.cancel()
+
+    async def _connect_and_listen(self):
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port, limit=MAX_FRAME_BYTES)
+        except OSError as e:
+            print(f"[IPC] '{self.name}' cannot reach broker at {self.host}:{self.port}: {e}")
+            return
+        peer = _Peer(writer, self.name)
+        try:
+            await peer.send({"op": "hello", "name": self.name})
+            for message_type in set(self.subscriptions) | self._reply_types:
+                await peer.send({"op": "subscribe", "type": message_type})
+            await peer.send({"op": "ready"})
+            self._peer = peer
+            self._connected.set()
+            async for frame in read_frames(reader):
+                if frame.get("op") == "deliver":
+                    await self._deliver(frame["message"])
+                    if "offset" in frame:
+                        # Queued (and in the local log, if durable here), so the broker can let go of it
+                        await peer.send({"op": "ack", "offset": frame["offset"]})
+        except ConnectionError as e:
+            print(f"[IPC] '{self.name}' lost broker connection: {e}")
+        finally:
+            self._connected.clear()
+            self._peer = None
+            writer.close()
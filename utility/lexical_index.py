@@ -0,0 +1,79 @@
+"""
+Local BM25 index over text chunks, plus reciprocal rank fusion for merging ranked lists.
+
+Dense retrieval misses exact identifiers (mine names, report numbers such as
+"SA-21-2025", cause codes such as "0335"); BM25 over the same chunks catches them
+without any network call.
+"""
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-/][a-z0-9]+)*")
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "to", "by", "and", "or", "for", "from", "with",
+    "is", "was", "were", "be", "been", "are", "as", "it", "its", "that", "this", "which", "what",
+    "who", "how", "when", "where", "did", "do", "does", "any", "all", "there",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms; identifiers like "sa-21-2025" are kept whole and also split into parts."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if "-" in token or "/" in token:
+            tokens.extend(part for part in re.split(r"[-/]", token) if part and part not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index."""
+
+    def __init__(self, texts: Sequence[str], metadatas: Optional[Sequence[dict]] = None, k1: float = 1.5, b: float = 0.75):
+        self.texts = list(texts)
+        self.metadatas = list(metadatas) if metadatas is not None else [{} for _ in self.texts]
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)  # term -> [(doc, term frequency)]
+        self.lengths = []
+        for doc_id, text in enumerate(self.texts):
+            counts = Counter(tokenize(text))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((doc_id, tf))
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        n = len(self.texts)
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def __len__(self):
+        return len(self.texts)
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (doc index, BM25 score), best first."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / self.avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[Hashable]], k: int = 60) -> List[Tuple[Hashable, float]]:
+    """Merge ranked lists of keys: score(key) = sum over lists of 1 / (k + rank). Best first."""
+    scores: Dict[Hashable, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
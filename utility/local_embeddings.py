@@ -0,0 +1,48 @@
+import threading
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    sentence-transformers model run on the local CPU, usable anywhere a LangChain
+    Embeddings object is. Documents are encoded in batches of `batch_size` and
+    torch uses `threads` intra-op threads. Vectors are L2-normalised, so Chroma's
+    distances and the numpy dot products elsewhere agree.
+    """
+
+    def __init__(self, model="all-MiniLM-L6-v2", batch_size=64, threads=None):
+        # Imported here so deployments on the Google provider never load torch
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model_name = model
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model, device="cpu")
+        self._lock = threading.Lock()  # one encode at a time; each already uses every thread
+
+    def _encode(self, texts):
+        with self._lock:
+            vectors = self.model.encode(
+                texts,
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+        return vectors.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._encode(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # Symmetric model: queries and documents are encoded the same way
+        return self.embed_documents(texts)
@@ -0,0 +1,162 @@
+import json
+import sqlite3
+import threading
+import time
+
+# Message types worth persisting: losing them means re-scraping or re-running LLM extraction
+DEFAULT_DURABLE_TYPES = ("new_dgms_report", "new_news_article")
+MAX_DELIVERY_ATTEMPTS = 3
+
+
+class MessageLog:
+    """
+    Append-only SQLite (WAL) log sitting behind MessageBus.publish.
+
+    Every durable message is written once, with one pending row per subscriber.
+    A subscriber acks a message when its handler finishes; anything still
+    pending at startup is redelivered (at-least-once). Each subscriber's
+    committed offset is the highest offset below which everything is acked.
+    """
+
+    def __init__(self, path, durable_types=DEFAULT_DURABLE_TYPES, max_attempts=MAX_DELIVERY_ATTEMPTS):
+        self.path = str(path)
+        self.durable_types = set(durable_types)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                offset INTEGER PRIMARY KEY AUTOINCREMENT,
+                type TEXT NOT NULL,
+                body TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pending (
+                offset INTEGER NOT NULL,
+                subscriber TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (offset, subscriber)
+            );
+            CREATE TABLE IF NOT EXISTS consumer_offsets (
+                subscriber TEXT PRIMARY KEY,
+                committed INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS subscribers (
+                type TEXT NOT NULL,
+                subscriber TEXT NOT NULL,
+                PRIMARY KEY (type, subscriber)
+            );
+            """
+        )
+
+    def is_durable(self, message_type):
+        return message_type in self.durable_types
+
+    def add_subscriber(self, message_type, subscriber):
+        """Remember that `subscriber` wants `message_type`, so messages published while it is away stay pending for it."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO subscribers (type, subscriber) VALUES (?, ?)", (message_type, subscriber)
+            )
+
+    def subscribers(self, message_type):
+        with self._lock:
+            rows = self._conn.execute("SELECT subscriber FROM subscribers WHERE type = ?", (message_type,)).fetchall()
+        return [subscriber for (subscriber,) in rows]
+
+    def append(self, message, subscribers):
+        """Persist a message and mark it pending for each subscriber. Returns its offset."""
+        body = json.dumps(message, default=str)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                cur = self._conn.execute(
+                    "INSERT INTO messages (type, body, created_at) VALUES (?, ?, ?)",
+                    (message.get("type"), body, time.time()),
+                )
+                offset = cur.lastrowid
+                self._conn.executemany(
+                    "INSERT INTO pending (offset, subscriber) VALUES (?, ?)",
+                    [(offset, s) for s in subscribers],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return offset
+
+    def ack(self, offset, subscriber):
+        """Mark a message handled by a subscriber and advance its committed offset."""
+        with self._lock:
+            self._conn.execute("DELETE FROM pending WHERE offset = ? AND subscriber = ?", (offset, subscriber))
+            row = self._conn.execute(
+                "SELECT MIN(offset) FROM pending WHERE subscriber = ?", (subscriber,)
+            ).fetchone()
+            committed = row[0] - 1 if row[0] is not None else self._last_offset()
+            self._conn.execute(
+                "INSERT INTO consumer_offsets (subscriber, committed) VALUES (?, ?) "
+                "ON CONFLICT(subscriber) DO UPDATE SET committed = MAX(committed, excluded.committed)",
+                (subscriber, committed),
+            )
+
+    def unacked(self, subscriber, max_offset=None):
+        """
+        Messages still pending for a subscriber, oldest first, up to `max_offset` if given.
+        Each call counts as a delivery attempt for the messages it returns; messages that
+        have failed max_attempts times are given up on.
+        """
+        ceiling = self.last_offset() if max_offset is None else max_offset
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                given_up = self._conn.execute(
+                    "SELECT offset FROM pending WHERE subscriber = ? AND attempts >= ? AND offset <= ?",
+                    (subscriber, self.max_attempts, ceiling),
+                ).fetchall()
+                for (offset,) in given_up:
+                    print(f"[MessageLog] Giving up on offset {offset} for {subscriber} after {self.max_attempts} attempts.")
+                self._conn.execute(
+                    "DELETE FROM pending WHERE subscriber = ? AND attempts >= ? AND offset <= ?",
+                    (subscriber, self.max_attempts, ceiling),
+                )
+                rows = self._conn.execute(
+                    "SELECT m.offset, m.body FROM pending p JOIN messages m ON m.offset = p.offset "
+                    "WHERE p.subscriber = ? AND m.offset <= ? ORDER BY m.offset",
+                    (subscriber, ceiling),
+                ).fetchall()
+                self._conn.execute(
+                    "UPDATE pending SET attempts = attempts + 1 WHERE subscriber = ? AND offset <= ?", (subscriber, ceiling)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(offset, json.loads(body)) for offset, body in rows]
+
+    def last_offset(self):
+        """Highest offset written so far (0 for an empty log)."""
+        with self._lock:
+            return self._last_offset()
+
+    def committed_offsets(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT subscriber, committed FROM consumer_offsets").fetchall())
+
+    def compact(self):
+        """Drop messages every subscriber has acked. Returns the number of rows removed."""
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM messages WHERE offset NOT IN (SELECT DISTINCT offset FROM pending)"
+            )
+            return cur.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _last_offset(self):
+        row = self._conn.execute("SELECT MAX(offset) FROM messages").fetchone()
+        return row[0] or 0
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+
+
+class Histogram:
+    """Latency samples over a sliding window, summarised as count/mean/p50/p95/p99."""
+
+    def __init__(self, window=1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentile(self, p):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        idx = min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(1000 * self.total / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(1000 * self.percentile(50), 2),
+            "p95_ms": round(1000 * self.percentile(95), 2),
+            "p99_ms": round(1000 * self.percentile(99), 2),
+        }
+
+
+class BusMetrics:
+    """Counters and latency histograms recorded by MessageBus, keyed by message type."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.counters = defaultdict(lambda: defaultdict(int))
+        self.by_agent = defaultdict(lambda: defaultdict(int))
+        self.latency = defaultdict(Histogram)
+        self.last_errors = {}
+
+    def incr(self, message_type, name, amount=1):
+        self.counters[message_type][name] += amount
+
+    def record_publish(self, message):
+        self.incr(message.get("type"), "published")
+        if message.get("from_agent"):
+            self.by_agent[message["from_agent"]]["published"] += 1
+
+    def record_handler(self, subscription_name, message_type, seconds, error=None):
+        self.latency[subscription_name].observe(seconds)
+        self.incr(message_type, "failed" if error else "handled")
+        if error is not None:
+            self.last_errors[subscription_name] = f"{type(error).__name__}: {error}"
+
+    def snapshot(self, bus=None):
+        """Plain-dict view of everything recorded so far, safe to json.dump."""
+        snap = {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "message_types": {t: dict(c) for t, c in self.counters.items()},
+            "agents": {a: dict(c) for a, c in self.by_agent.items()},
+            "handlers": {name: h.summary() for name, h in self.latency.items()},
+            "last_errors": dict(self.last_errors),
+        }
+        if bus is not None:
+            snap["queues"] = {
+                sub.name: {
+                    "depth": sub.depth(),
+                    "in_flight": sub.in_flight(),
+                    "max_concurrency": sub.max_concurrency,
+                    "maxsize": sub.maxsize,
+                    "dropped": sub.dropped,
+                    "rejected": sub.rejected,
+                }
+                for subs in bus.subscriptions.values()
+                for sub in subs
+            }
+        return snap
+
+
+# Extra stats (e.g. cache hit rates) added to every exported snapshot: name -> callable returning a dict
+STATS_PROVIDERS = {}
+
+
+def register_stats(name, provider):
+    STATS_PROVIDERS[name] = provider
+
+
+def write_snapshot(snapshot, path):
+    """Atomically replace the snapshot file so readers never see a half-written JSON."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_snapshots(directory):
+    """Read every exported snapshot in a directory, keyed by process ("main" for single-process mode)."""
+    snapshots = {}
+    for path in sorted(Path(directory).glob("bus_metrics*.json")):
+        name = path.stem[len("bus_metrics_"):] or "main"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshots[name] = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[metrics] Skipping unreadable snapshot {path}: {e}")
+    return snapshots
+
+
+async def export_periodically(bus, path, interval=10, supervisor=None):
+    """Dump bus.metrics_snapshot() (plus supervisor liveness and registered stats) to disk every `interval` seconds."""
+    while True:
+        try:
+            snapshot = bus.metrics_snapshot()
+            if supervisor is not None:
+                snapshot["liveness"] = supervisor.liveness()
+                snapshot["healthy"] = supervisor.healthy()
+            for name, provider in STATS_PROVIDERS.items():
+                snapshot[name] = provider()
+            await asyncio.to_thread(write_snapshot, snapshot, path)
+        except Exception as e:
+            print(f"[metrics] Failed to export snapshot to {path}: {e}")
+        await asyncio.sleep(interval)
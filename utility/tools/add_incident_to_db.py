@@ -1,9 +1,11 @@
 from pymongo import MongoClient
 import certifi
 from datetime import datetime, timezone
-from utility.config import MONGODB_URI, MONGODB_DB, MONGODB_COLLECTION
+from utility.config import MONGODB_URI, MONGODB_DB, MONGODB_COLLECTION, INCIDENT_EMBEDDING_FIELD
 from schemas import Report, MineDetails, IncidentDetails, Verification
 from utility.tools.find_cause_code import FindCauseCodeTool
+from utility.vector_stores import get_shared
+from utility.incident_index import incident_embedding
 from utility.local_search import google_web_search
 import re
 
@@ -19,6 +21,8 @@ class AddIncidentToDBTool:
         self.description = "Adds a new incident to the database."
         self.client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=4000, tlsCAFile=certifi.where())
         self.coll = self.client[MONGODB_DB][MONGODB_COLLECTION]
+        # One finder per process, shared with any other tool that maps causes to codes
+        self.cause_code_finder = get_shared("find_cause_code", FindCauseCodeTool)
 
     def use(self, incident: dict, source_url: str, raw_title: str) -> dict:
         """Add a new incident entry into MongoDB."""
@@ -30,8 +34,7 @@ class AddIncidentToDBTool:
         # Ensure cause_code is computed from brief_cause if not provided
         if not incident.get("cause_code") and incident.get("brief_cause"):
             try:
-                finder = FindCauseCodeTool()
-                code = finder.use(incident.get("brief_cause", ""))
+                code = self.cause_code_finder.use(incident.get("brief_cause", ""))
                 if code:
                     incident["cause_code"] = code
             except Exception as e:
@@ -62,6 +65,9 @@ class AddIncidentToDBTool:
             )
 
             doc = report.model_dump(by_alias=True)
+            embedding = incident_embedding(doc)
+            if embedding:
+                doc[INCIDENT_EMBEDDING_FIELD] = embedding
             result = self.coll.insert_one(doc)
 
             print(f"Incident added to DB with _id: {result.inserted_id}")
@@ -1,5 +1,6 @@
 
 from utility.db import ensure_mongo_collection
+from utility.config import INCIDENT_EMBEDDING_FIELD
 from utility.analysis import make_advanced_report, render_narrative
 
 class AnalyzeIncidentPatternsTool:
@@ -14,7 +15,7 @@ class AnalyzeIncidentPatternsTool:
             return "Error: MongoDB not available."
 
         # Fetch all incidents from the database
-        incidents = list(self.coll.find({}))
+        incidents = list(self.coll.find({}, {INCIDENT_EMBEDDING_FIELD: 0}))
 
         if not incidents:
             return "No incidents found in the database for analysis."
@@ -4,9 +4,9 @@ Backfill missing incident_details.cause_code in MongoDB by mapping from incident
 using the local cause_code_db vector store.
 
 Usage:
-    python3 utility/tools/backfill_cause_codes.py           # live updates
-    DRY_RUN=1 python3 utility/tools/backfill_cause_codes.py # preview only
-    LIMIT=100 python3 utility/tools/backfill_cause_codes.py # limit documents processed
+    python3 -m utility.tools.backfill_cause_codes           # live updates
+    DRY_RUN=1 python3 -m utility.tools.backfill_cause_codes # preview only
+    LIMIT=100 python3 -m utility.tools.backfill_cause_codes # limit documents processed
 
 Environment variables:
     - MONGODB_URI           (default: mongodb://localhost:27017)
@@ -14,14 +14,15 @@ Environment variables:
     - MONGODB_COLLECTION    (default: dgms_reports)
     - DRY_RUN               (0/1)
     - LIMIT                 (int)
+    - BATCH_SIZE            (int, brief causes mapped per embedding request)
 """
 import os
-from typing import Any, Dict
-from pymongo import MongoClient
+from typing import Any, Dict, List
+from pymongo import MongoClient, UpdateOne
 from pymongo.errors import ServerSelectionTimeoutError, PyMongoError
 from dotenv import load_dotenv
 
-from find_cause_code import FindCauseCodeTool
+from utility.tools.find_cause_code import FindCauseCodeTool
 
 load_dotenv()
 
@@ -75,28 +76,40 @@ def query_missing(limit: int):
         return coll, []
 
 
-def backfill_one(coll, finder: FindCauseCodeTool, doc: Dict[str, Any], dry: bool = False) -> bool:
-    inc = (doc.get("incident_details") or {})
-    brief = (inc.get("brief_cause") or "").strip()
-    if not brief:
-        return False
-    code = finder.use(brief)
-    if not code:
-        return False
+def brief_cause_of(doc: Dict[str, Any]) -> str:
+    return ((doc.get("incident_details") or {}).get("brief_cause") or "").strip()
+
+
+def backfill_batch(coll, finder: FindCauseCodeTool, docs: List[Dict[str, Any]], dry: bool = False) -> int:
+    """Map a batch of documents in one use_batch call and write the codes back in one bulk update."""
+    docs = [d for d in docs if brief_cause_of(d)]
+    if not docs:
+        return 0
+    matches = finder.use_batch([brief_cause_of(d) for d in docs])
+    updates = []
+    for doc, (code, score) in zip(docs, matches):
+        if not code:
+            continue
+        report = doc.get("report_id", str(doc.get("_id")))
+        if dry:
+            print(f"→ DRY RUN: Would set cause_code='{code}' (score {score:.2f}) for report_id={report}")
+        else:
+            updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"incident_details.cause_code": code}}))
+            print(f"✓ report_id={report} cause_code={code} (score {score:.2f})")
     if dry:
-        print(f"→ DRY RUN: Would set cause_code='{code}' for report_id={doc.get('report_id', '<no-id>')}")
-        return True
+        return sum(1 for code, _ in matches if code)
+    if not updates:
+        return 0
     try:
-        coll.update_one({"_id": doc["_id"]}, {"$set": {"incident_details.cause_code": code}})
-        print(f"✓ Updated report_id={doc.get('report_id', str(doc.get('_id')))} cause_code={code}")
-        return True
-    except Exception as e:
-        print(f"✗ Failed to update {doc.get('report_id', str(doc.get('_id')))}: {e}")
-        return False
+        return coll.bulk_write(updates, ordered=False).modified_count
+    except PyMongoError as e:
+        print(f"✗ Bulk update failed: {e}")
+        return 0
 
 
 def main():
     limit = int(os.environ.get("LIMIT", "200"))
+    batch_size = int(os.environ.get("BATCH_SIZE", "100"))
     dry = os.environ.get("DRY_RUN", "0").lower() in ("1", "true", "yes")
     coll, docs = query_missing(limit)
     if coll is None:
@@ -112,9 +125,8 @@ def main():
         print("Failed to initialize FindCauseCodeTool:", e)
         return
     updated = 0
-    for d in docs:
-        if backfill_one(coll, finder, d, dry=dry):
-            updated += 1
+    for i in range(0, len(docs), batch_size):
+        updated += backfill_batch(coll, finder, docs[i:i + batch_size], dry=dry)
     print(f"Done. Updated {updated}/{len(docs)} docs.")
 
 
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Backfill the incident embedding used for vector retrieval (see utility/incident_index.py)
+on documents inserted before it existed, or embedded with a different EMBEDDING_MODEL.
+
+Usage:
+    python3 -m utility.tools.backfill_incident_embeddings           # live updates
+    DRY_RUN=1 python3 -m utility.tools.backfill_incident_embeddings # preview only
+    LIMIT=100 python3 -m utility.tools.backfill_incident_embeddings # limit documents processed
+
+Environment variables:
+    - MONGODB_URI           (default: mongodb://localhost:27017)
+    - MONGODB_DB            (default: mine_safety)
+    - MONGODB_COLLECTION    (default: dgms_reports)
+    - DRY_RUN               (0/1)
+    - LIMIT                 (int)
+    - BATCH_SIZE            (int, incidents embedded per request)
+"""
+import os
+from typing import Any, Dict, List
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from dotenv import load_dotenv
+
+from utility.config import EMBEDDING_MODEL, INCIDENT_EMBEDDING_FIELD
+from utility.incident_index import INCIDENT_TEXT_PROJECTION, incident_embeddings
+from utility.tools.backfill_cause_codes import get_collection
+
+load_dotenv()
+
+
+def query_missing(limit: int):
+    coll = get_collection()
+    if coll is None:
+        return None, []
+    q = {f"{INCIDENT_EMBEDDING_FIELD}.model": {"$ne": EMBEDDING_MODEL}}  # also matches a missing field
+    try:
+        return coll, list(coll.find(q, INCIDENT_TEXT_PROJECTION).limit(limit))
+    except PyMongoError as e:
+        print("MongoDB error while querying documents:", e)
+        return coll, []
+
+
+def backfill_batch(coll, docs: List[Dict[str, Any]], dry: bool = False) -> int:
+    """Embed a batch of documents in one request and write the embeddings back in one bulk update."""
+    try:
+        embeddings = incident_embeddings(docs)
+    except Exception as e:
+        print(f"✗ Embedding request failed: {e}")
+        return 0
+    updates = [
+        UpdateOne({"_id": doc["_id"]}, {"$set": {INCIDENT_EMBEDDING_FIELD: embedding}})
+        for doc, embedding in zip(docs, embeddings) if embedding
+    ]
+    if dry:
+        print(f"→ DRY RUN: Would embed {len(updates)} of {len(docs)} docs")
+        return len(updates)
+    if not updates:
+        return 0
+    try:
+        modified = coll.bulk_write(updates, ordered=False).modified_count
+        print(f"✓ Embedded {modified} docs")
+        return modified
+    except PyMongoError as e:
+        print(f"✗ Bulk update failed: {e}")
+        return 0
+
+
+def main():
+    limit = int(os.environ.get("LIMIT", "1000"))
+    batch_size = int(os.environ.get("BATCH_SIZE", "100"))
+    dry = os.environ.get("DRY_RUN", "0").lower() in ("1", "true", "yes")
+    coll, docs = query_missing(limit)
+    if coll is None:
+        # Connection guidance already printed in get_collection()
+        return
+    if not docs:
+        print(f"All documents already have {EMBEDDING_MODEL} embeddings.")
+        return
+    print(f"Found {len(docs)} documents without {EMBEDDING_MODEL} embeddings. Processing…")
+    updated = 0
+    for i in range(0, len(docs), batch_size):
+        updated += backfill_batch(coll, docs[i:i + batch_size], dry=dry)
+    print(f"Done. Updated {updated}/{len(docs)} docs.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 
 import os
-import re
-from langchain_chroma import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from typing import List, Tuple
+from utility.config import CAUSE_CODE_DB_DIR
+from utility.vector_stores import get_vector_store, get_embeddings
+from utility.code_table import CAUSE, load_code_table, match_in_text
 
 class FindCauseCodeTool:
     """A tool to find the most relevant cause code from a dedicated vector store."""
@@ -10,27 +11,87 @@ class FindCauseCodeTool:
     def __init__(self):
         self.name = "find_cause_code"
         self.description = "Finds the most similar cause code for a given brief cause by searching a specialized vector database."
-        self.vector_store = self._load_vector_store()
+        # The parsed code table answers most lookups locally; the vector store is only needed without it
+        self.code_table = self._load_code_table()
+        self.vector_store = self._load_vector_store() if self.code_table is None else None
+
+    def _load_code_table(self):
+        try:
+            embeddings = get_embeddings()
+        except Exception as e:
+            print(f"[WARN] No embeddings client for the code table fallback: {e}")
+            embeddings = None
+        return load_code_table(embeddings)
 
     def _load_vector_store(self):
-        db_dir = "cause_code_db"
+        db_dir = CAUSE_CODE_DB_DIR
         if not os.path.exists(db_dir):
             print(f"[ERROR] Cause code database not found at '{db_dir}'. This tool will not work.")
             return None
         
         try:
-            embeddings = GoogleGenerativeAIEmbeddings(
-                model="models/text-embedding-004", 
-                google_api_key=os.getenv("GOOGLE_API_KEY")
-            )
-            return Chroma(persist_directory=db_dir, embedding_function=embeddings)
+            return get_vector_store(db_dir)
         except Exception as e:
             print(f"[ERROR] Failed to load cause code vector store: {e}")
             return None
 
+    def use_batch(self, brief_causes: List[str]) -> List[Tuple[str, float]]:
+        """
+        Maps many brief causes at once, returning (cause_code, similarity) per input
+        ("" and 0.0 where nothing matched). Inputs without a local match are embedded
+        in a single request and compared against all code vectors in one go.
+        """
+        if self.code_table is None:
+            return self._search_batch(brief_causes)
+
+        matches = self.code_table.lookup_batch(brief_causes, CAUSE)
+        found = sum(1 for m in matches if m)
+        print(f"Matched cause codes for {found}/{len(brief_causes)} brief causes.")
+        return [(m[0].code, m[1]) if m else ("", 0.0) for m in matches]
+
+    def _search_batch(self, brief_causes: List[str]) -> List[Tuple[str, float]]:
+        """Without a code table: nearest cause code DB entry per input, with its relevance score."""
+        results = [("", 0.0)] * len(brief_causes)
+        present = [i for i, text in enumerate(brief_causes) if text]
+        if not self.vector_store or not present:
+            return results
+        queries = [brief_causes[i] for i in present]
+        try:
+            if hasattr(self.vector_store, "similarity_search_batch"):
+                # Flat index: one embedding request and one matrix product for all inputs
+                hits = self.vector_store.similarity_search_batch(queries, k=1)
+            else:
+                hits = [self.vector_store.similarity_search_with_relevance_scores(q, k=1) for q in queries]
+        except Exception as e:
+            print(f"[ERROR] Batched cause code search failed: {e}")
+            return results
+        for i, rows in zip(present, hits):
+            if not rows:
+                continue
+            doc, score = rows[0]
+            # A chunk lists many codes; take the one whose description fits the input
+            entry = match_in_text(doc.page_content, brief_causes[i], CAUSE)
+            if entry is not None:
+                results[i] = (entry.code, float(score))
+        found = sum(1 for code, _ in results if code)
+        print(f"Matched cause codes for {found}/{len(brief_causes)} brief causes from the cause code DB.")
+        return results
+
     def use(self, brief_cause: str) -> str:
-        """Performs similarity search on the cause code DB and extracts the code."""
-        if not self.vector_store or not brief_cause:
+        """Looks the code up in the parsed code table, or searches the cause code DB if the table is unavailable."""
+        if not brief_cause:
+            return ""
+
+        if self.code_table is not None:
+            match = self.code_table.lookup(brief_cause, CAUSE)
+            if match is None:
+                print(f"No cause code matched '{brief_cause}'.")
+                return ""
+            entry, score, method = match
+            print(f"Matched cause code {entry.code} ({entry.description}) by {method} match, score {score:.2f}")
+            return entry.code
+
+        if not self.vector_store:
             return ""
 
         print(f"Searching for cause code for: '{brief_cause}'")
@@ -46,15 +107,14 @@ class FindCauseCodeTool:
             page_content = results[0].page_content
             print(f"Most similar document content: '{page_content}'")
 
-            # Use a robust regex to find a 3 or 4 digit code
-            match = re.search(r"Code: (\d+)", page_content)
+            # The chunk is a slice of the code statement; pick the listed code whose description fits
+            entry = match_in_text(page_content, brief_cause, CAUSE)
             
-            if match:
-                cause_code = match.group(1)
-                print(f"Successfully extracted cause code: {cause_code}")
-                return cause_code
+            if entry is not None:
+                print(f"Successfully extracted cause code: {entry.code} ({entry.description})")
+                return entry.code
             else:
-                print("Could not extract a numeric code from the document.")
+                print("Could not match a cause code in the document.")
                 return ""
 
         except Exception as e:
@@ -1,7 +1,8 @@
 import os
 import re
-from langchain_chroma import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from utility.config import CAUSE_CODE_DB_DIR
+from utility.vector_stores import get_vector_store, get_embeddings
+from utility.code_table import PLACE, load_code_table
 
 class FindPlaceOfAccidentCodeTool:
     """A tool to find the most relevant place of accident code from a dedicated vector store."""
@@ -9,27 +10,45 @@ class FindPlaceOfAccidentCodeTool:
     def __init__(self):
         self.name = "find_place_of_accident_code"
         self.description = "Finds the most similar place of accident code for a given place of accident by searching a specialized vector database."
-        self.vector_store = self._load_vector_store()
+        # The parsed code table answers most lookups locally; the vector store is only needed without it
+        self.code_table = self._load_code_table()
+        self.vector_store = self._load_vector_store() if self.code_table is None else None
+
+    def _load_code_table(self):
+        try:
+            embeddings = get_embeddings()
+        except Exception as e:
+            print(f"[WARN] No embeddings client for the code table fallback: {e}")
+            embeddings = None
+        return load_code_table(embeddings)
 
     def _load_vector_store(self):
-        db_dir = "cause_code_db"
+        db_dir = CAUSE_CODE_DB_DIR
         if not os.path.exists(db_dir):
             print(f"[ERROR] Cause code database not found at '{db_dir}'. This tool will not work.")
             return None
         
         try:
-            embeddings = GoogleGenerativeAIEmbeddings(
-                model="models/text-embedding-004", 
-                google_api_key=os.getenv("GOOGLE_API_KEY")
-            )
-            return Chroma(persist_directory=db_dir, embedding_function=embeddings)
+            return get_vector_store(db_dir)
         except Exception as e:
             print(f"[ERROR] Failed to load cause code vector store: {e}")
             return None
 
     def use(self, place_of_accident: str) -> str:
-        """Performs similarity search on the cause code DB and extracts the code."""
-        if not self.vector_store or not place_of_accident:
+        """Looks the code up in the parsed code table, or searches the cause code DB if the table is unavailable."""
+        if not place_of_accident:
+            return ""
+
+        if self.code_table is not None:
+            match = self.code_table.lookup(place_of_accident, PLACE)
+            if match is None:
+                print(f"No place of accident code matched '{place_of_accident}'.")
+                return ""
+            entry, score, method = match
+            print(f"Matched place of accident code {entry.code} ({entry.description}) by {method} match, score {score:.2f}")
+            return entry.code
+
+        if not self.vector_store:
             return ""
 
         print(f"Searching for place of accident code for: '{place_of_accident}'")
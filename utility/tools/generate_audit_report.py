@@ -5,7 +5,7 @@ from utility.db import ensure_mongo_collection
 from utility.tools.analyze_incident_patterns import AnalyzeIncidentPatternsTool
 from utility.tools.generate_safety_alerts import GenerateSafetyAlertsTool
 from utility.tools.generate_recommendations import GenerateRecommendationsTool
-from utility.config import DATA_DIR
+from utility.config import DATA_DIR, INCIDENT_EMBEDDING_FIELD
 
 class GenerateAuditReportTool:
     def __init__(self):
@@ -31,7 +31,7 @@ class GenerateAuditReportTool:
                 "$lte": end_date.strftime("%Y-%m-%d")
             }
         }
-        incidents = list(self.coll.find(query))
+        incidents = list(self.coll.find(query, {INCIDENT_EMBEDDING_FIELD: 0}))
         num_incidents = len(incidents)
         # Note: This is a simplified fatality/injury count
         num_fatalities = sum(len(i.get("incident_details", {}).get("fatalities", [])) for i in incidents)
@@ -1,5 +1,5 @@
-from langchain_chroma import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from utility.config import CAUSE_CODE_DB_DIR
+from utility.vector_stores import get_vector_store
 import os
 
 class SearchCauseCodeDBTool:
@@ -9,13 +9,12 @@ class SearchCauseCodeDBTool:
         self.vector_store = self._load_vector_store()
 
     def _load_vector_store(self):
-        db_dir = "cause_code_db"
+        db_dir = CAUSE_CODE_DB_DIR
         if not os.path.exists(db_dir):
             print(f"Error: Cause code database not found at {db_dir}")
             return None
         
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=os.getenv("GOOGLE_API_KEY"))
-        return Chroma(persist_directory=db_dir, embedding_function=embeddings)
+        return get_vector_store(db_dir)
 
     def use(self, query: str) -> str:
         print(f"Searching cause code database for: {query}")
@@ -0,0 +1,124 @@
+"""
+Process-wide registry of embedding clients and Chroma stores.
+
+Every tool that needs `cause_code_db` (or any other store) asks here instead of
+opening its own Chroma client, so each store and embedding client is created once
+per process and shared by all tools and executor threads.
+"""
+import json
+import os
+import threading
+
+from langchain_chroma import Chroma
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+from utility.config import (
+    EMBEDDING_PROVIDER, EMBEDDING_MODEL, EMBEDDING_CACHE, EMBEDDING_CACHE_PATH,
+    LOCAL_EMBEDDING_BATCH_SIZE, LOCAL_EMBEDDING_THREADS, VECTOR_BACKEND, FLAT_INDEX_DTYPE, FLAT_INDEX_RESCORE,
+)
+from utility.embedding_cache import CachedEmbeddings
+from utility.flat_index import FlatVectorStore, has_flat_index
+from utility.metrics import register_stats
+
+_lock = threading.Lock()
+_embeddings = {}  # (provider, model) -> embeddings client
+_stores = {}      # (absolute persist directory, provider, model) -> Chroma or FlatVectorStore
+_shared = {}      # name -> object built by get_shared
+
+STORE_INFO_FILE = "embedding.json"  # written next to a store by the scripts that build it
+
+
+def with_cache(embeddings, model):
+    """Wrap an embeddings client in the persistent embedding cache (unless EMBEDDING_CACHE is off)."""
+    if not EMBEDDING_CACHE:
+        return embeddings
+    cached = CachedEmbeddings(embeddings, model, EMBEDDING_CACHE_PATH)
+    register_stats(f"embedding_cache:{model}", cached.stats)
+    return cached
+
+
+def make_embeddings(model=EMBEDDING_MODEL, provider=EMBEDDING_PROVIDER, **google_kwargs):
+    """A new, uncached embeddings client for `provider` ("google" or "local")."""
+    if provider == "local":
+        from utility.local_embeddings import LocalEmbeddings
+        return LocalEmbeddings(model, LOCAL_EMBEDDING_BATCH_SIZE, LOCAL_EMBEDDING_THREADS)
+    if provider == "google":
+        return GoogleGenerativeAIEmbeddings(model=model, google_api_key=os.getenv("GOOGLE_API_KEY"), **google_kwargs)
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {provider!r} (expected 'google' or 'local')")
+
+
+def get_embeddings(model=EMBEDDING_MODEL, provider=EMBEDDING_PROVIDER):
+    """The shared (cached) embeddings client for `model`."""
+    with _lock:
+        client = _embeddings.get((provider, model))
+        if client is None:
+            client = with_cache(make_embeddings(model, provider), model)
+            _embeddings[(provider, model)] = client
+        return client
+
+
+def write_store_info(persist_directory, model=EMBEDDING_MODEL, provider=EMBEDDING_PROVIDER):
+    """Record which provider/model a store was embedded with, so a mismatch is reported on load."""
+    with open(os.path.join(persist_directory, STORE_INFO_FILE), "w", encoding="utf-8") as f:
+        json.dump({"provider": provider, "model": model}, f)
+
+
+def read_store_info(persist_directory):
+    """The provider/model recorded by `write_store_info`, or None if the store has no readable record."""
+    path = os.path.join(persist_directory, STORE_INFO_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _check_store_info(persist_directory, model, provider):
+    info = read_store_info(persist_directory)
+    if info is None:
+        return
+    if (info.get("provider"), info.get("model")) != (provider, model):
+        print(
+            f"[WARN] {persist_directory} was embedded with {info.get('provider')}/{info.get('model')} "
+            f"but {provider}/{model} is configured; run rebuild_vector_stores.py."
+        )
+
+
+def get_vector_store(persist_directory, model=EMBEDDING_MODEL, provider=EMBEDDING_PROVIDER):
+    """
+    The shared store persisted at `persist_directory`, or None if the directory does
+    not exist (callers already report a missing store themselves). With
+    VECTOR_BACKEND=flat, stores that have an exported flat index are served from it.
+    """
+    key = (os.path.abspath(persist_directory), provider, model)
+    embeddings = get_embeddings(model, provider)
+    with _lock:
+        store = _stores.get(key)
+        if store is None:
+            if not os.path.exists(persist_directory):
+                return None
+            _check_store_info(persist_directory, model, provider)
+            if VECTOR_BACKEND == "flat" and has_flat_index(persist_directory):
+                try:
+                    store = FlatVectorStore.load(
+                        persist_directory, embeddings, FLAT_INDEX_DTYPE, FLAT_INDEX_RESCORE, provider, model
+                    )
+                except ValueError as e:
+                    print(f"[WARN] {e} Serving {persist_directory} from Chroma instead.")
+            if store is None:
+                store = Chroma(persist_directory=persist_directory, embedding_function=embeddings)
+            _stores[key] = store
+        return store
+
+
+def get_shared(name, factory):
+    """One instance per process of whatever `factory` builds, e.g. a tool reused by other tools."""
+    with _lock:
+        obj = _shared.get(name)
+    if obj is not None:
+        return obj
+    obj = factory()  # built outside the lock, since factories may call get_vector_store
+    with _lock:
+        return _shared.setdefault(name, obj)